@@ -5,16 +5,21 @@
 # Dify API配置
 DIFY_API_KEY = "your_dify_api_key"
 DIFY_API_URL = "https://api.dify.ai/v1"
+DIFY_CACHE_DIR = ".auto_deploy_cache"  # 需求解析结果缓存目录
+DIFY_CACHE_TTL = 86400  # 缓存有效期（秒）
 
 # 大模型API配置
 LLM_API_KEY = "your_llm_api_key"
 LLM_API_URL = "https://api.openai.com/v1"
 LLM_MODEL = "gpt-4"
+LLM_TIMEOUT = (10, 300)  # 请求超时时间（连接, 读取），单位秒
 
 # Git配置
 GIT_USERNAME = "your_git_username"
 GIT_TOKEN = "your_git_token"
+GIT_EMAIL = "your_git_email@example.com"  # 仓库未配置 user.email 时的提交者邮箱
 DEFAULT_BRANCH = "main"
+GIT_WORKSPACE_ROOT = None  # 临时工作目录的父目录，None时使用系统临时目录，可设为/dev/shm
 
 # Jenkins配置
 JENKINS_URL = "https://jenkins.example.com"
@@ -4,34 +4,64 @@
 
 import os
 import sys
+import mmap
+import stat
 import json
 import time
+import queue
 import logging
 import argparse
+from enum import IntEnum
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 
 # 添加模块路径
+# git_operations、mcp_protocol、jenkins_ops 在实际使用时才导入，以加快启动速度
 from modules.dify_api import analyze_requirements, DifyClient
-from modules.git_operations import GitOperator
 from modules.llm_interface import LLMInterface
-from modules.mcp_protocol import MCPClient, notify_build_start
-from modules.jenkins_ops import JenkinsClient
 from modules.notification import send_deployment_notification
 
+# 日志写入放到后台线程，调用方只负责入队
+_log_listener = QueueListener(
+    queue.Queue(-1),
+    logging.FileHandler("auto_deploy.log"),
+    logging.StreamHandler()
+)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("auto_deploy.log"),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_listener.queue)]
 )
+_log_listener.start()
 logger = logging.getLogger(__name__)
 
 
+class Stage(IntEnum):
+    """部署阶段"""
+    REQ = 0
+    GIT = 1
+    JENKINS = 2
+    NOTIFY = 3
+
+
+# 阶段显示名称，按 Stage 取值索引，用于日志和MCP
+_STAGE_NAMES = ["需求解析", "Git操作", "Jenkins构建", "消息通知"]
+
+
 class AutoDeployment:
     """自动化部署流程管理器"""
 
+    # 日志级别到logger方法及MCP级别名的映射
+    _LEVEL_FNS = {
+        "INFO": logger.info,
+        "WARNING": logger.warning,
+        "ERROR": logger.error,
+        "DEBUG": logger.debug
+    }
+    _LEVEL_NAMES = {level: level.lower() for level in _LEVEL_FNS}
+    _LEVEL_INT = {level: logging.getLevelName(level) for level in _LEVEL_FNS}
+
     def __init__(self, project_name, git_repo, jenkins_job=None, mcp_monitor=True):
         """
         初始化自动部署流程
@@ -47,32 +77,60 @@ class AutoDeployment:
         self.jenkins_job = jenkins_job
         self.mcp_monitor = mcp_monitor
 
-        # 初始化组件
-        self.llm = LLMInterface()
-        self.git = GitOperator(git_repo)
+        # 后台线程池，用于并行执行相互独立的网络操作
+        self._pool = ThreadPoolExecutor(max_workers=4)
+        self._clone_future = None
+        self._analysis_future = None
 
-        # 初始化MCP客户端
+        # 初始化MCP客户端（会话在后台创建，首次使用时再获取结果）
         if mcp_monitor:
+            from modules.mcp_protocol import MCPClient
             self.mcp = MCPClient()
-            self.session_id = self.mcp.create_session(
+            self._mcp_future = self._pool.submit(
+                self.mcp.create_session,
                 project_name=project_name,
                 pipeline_name="自动部署流程",
                 description=f"项目 {project_name} 的自动化部署流程"
             )
         else:
             self.mcp = None
-            self.session_id = None
+            self._mcp_future = None
+        self._session_id = None
+
+        # 初始化组件
+        self.llm = LLMInterface()
+        from modules.git_operations import GitOperator
+        self.git = GitOperator(git_repo)
 
         # 初始化Jenkins客户端
         if jenkins_job:
+            from modules.jenkins_ops import JenkinsClient
             self.jenkins = JenkinsClient()
         else:
             self.jenkins = None
 
         # 记录阶段和状态
-        self.stages = {}
+        self.stages = [None] * len(Stage)
         self.current_stage = None
-        self.start_time = time.time()
+        self.feature_branch = None
+        self.start_time = time.monotonic()
+
+    @property
+    def session_id(self):
+        """MCP会话ID，首次访问时等待后台创建完成"""
+        if self._mcp_future is not None:
+            self._session_id = self._mcp_future.result()
+            self._mcp_future = None
+        return self._session_id
+
+    def _duration(self):
+        """
+        流程已运行时长
+
+        Returns:
+            int: 秒数
+        """
+        return int(time.monotonic() - self.start_time)
 
     def log(self, message, level="INFO", stage_id=None):
         """
@@ -83,58 +141,60 @@ class AutoDeployment:
             level (str): 日志级别
             stage_id (str, optional): 阶段ID
         """
-        if level == "INFO":
-            logger.info(message)
-        elif level == "WARNING":
-            logger.warning(message)
-        elif level == "ERROR":
-            logger.error(message)
-        elif level == "DEBUG":
-            logger.debug(message)
-
-        # 同步到MCP
+        # 未启用MCP且该级别不会输出时直接返回
+        if not self.mcp and not logger.isEnabledFor(
+                self._LEVEL_INT.get(level, logging.INFO)):
+            return
+
+        self._LEVEL_FNS.get(level, logger.info)(message)
+
+        # MCP客户端将日志放入队列，由后台线程批量同步
         if self.mcp and self.session_id:
-            self.mcp.add_log(message, level.lower(),
-                             stage_id or self.current_stage)
+            self.mcp.add_log(
+                message,
+                level=self._LEVEL_NAMES.get(level) or level.lower(),
+                stage_id=stage_id or self.current_stage
+            )
 
-    def start_stage(self, stage_name, description=""):
+    def start_stage(self, stage, description=""):
         """
         开始新阶段
 
         Args:
-            stage_name (str): 阶段名称
+            stage (Stage): 阶段
             description (str): 阶段描述
 
         Returns:
             str: 阶段ID
         """
+        stage_name = _STAGE_NAMES[stage]
         self.log(f"开始阶段: {stage_name}")
 
         # 创建MCP阶段
         if self.mcp and self.session_id:
             stage_id = self.mcp.add_stage(stage_name, "running", description)
-            self.stages[stage_name] = stage_id
+            self.stages[stage] = stage_id
             self.current_stage = stage_id
             return stage_id
         else:
-            self.stages[stage_name] = stage_name
+            self.stages[stage] = stage_name
             self.current_stage = stage_name
             return stage_name
 
-    def end_stage(self, stage_name, status="success", message=""):
+    def end_stage(self, stage, status="success", message=""):
         """
         结束阶段
 
         Args:
-            stage_name (str): 阶段名称
+            stage (Stage): 阶段
             status (str): 阶段状态
             message (str): 状态消息
         """
-        self.log(f"结束阶段: {stage_name} ({status})")
+        self.log(f"结束阶段: {_STAGE_NAMES[stage]} ({status})")
 
         # 更新MCP阶段
         if self.mcp and self.session_id:
-            stage_id = self.stages.get(stage_name)
+            stage_id = self.stages[stage]
             if stage_id:
                 self.mcp.update_stage(stage_id, status, message)
 
@@ -148,26 +208,30 @@ class AutoDeployment:
         Returns:
             Dict[str, Any]: 解析结果
         """
-        stage_id = self.start_stage("需求解析", "分析需求文档生成代码修改方案")
+        stage_id = self.start_stage(Stage.REQ, "分析需求文档生成代码修改方案")
 
         try:
             self.log("正在分析需求文档...")
-            analysis_result = analyze_requirements(doc_text)
+            if self._analysis_future is not None:
+                analysis_result = self._analysis_future.result()
+                self._analysis_future = None
+            else:
+                analysis_result = analyze_requirements(doc_text)
 
             if "error" in analysis_result:
                 self.log(f"需求分析出错: {analysis_result['error']}", "ERROR")
-                self.end_stage("需求解析", "failed",
+                self.end_stage(Stage.REQ, "failed",
                                f"需求分析失败: {analysis_result['error']}")
                 return None
 
             self.log(
                 f"需求分析完成，找到 {len(analysis_result.get('files_to_modify', []))} 个需要修改的文件")
-            self.end_stage("需求解析", "success", "需求分析成功")
+            self.end_stage(Stage.REQ, "success", "需求分析成功")
             return analysis_result
 
         except Exception as e:
             self.log(f"需求解析阶段出错: {str(e)}", "ERROR")
-            self.end_stage("需求解析", "failed", f"需求解析失败: {str(e)}")
+            self.end_stage(Stage.REQ, "failed", f"需求解析失败: {str(e)}")
             return None
 
     def git_operations_stage(self, analysis_result):
@@ -180,28 +244,33 @@ class AutoDeployment:
         Returns:
             bool: 操作是否成功
         """
-        stage_id = self.start_stage("Git操作", "执行代码版本控制操作")
+        stage_id = self.start_stage(Stage.GIT, "执行代码版本控制操作")
 
         try:
             # 从分析结果中获取Git分支策略
             git_strategy = analysis_result.get("git_strategy", "使用feature分支")
-            feature_branch = f"feature/auto-update-{int(time.time())}"
+            feature_branch = self.feature_branch
 
             self.log(f"Git策略: {git_strategy}")
             self.log(f"创建特性分支: {feature_branch}")
 
             # 克隆仓库
             self.log("正在克隆仓库...")
-            if not self.git.clone():
+            if self._clone_future is not None:
+                cloned = self._clone_future.result()
+                self._clone_future = None
+            else:
+                cloned = self.git.clone()
+            if not cloned:
                 self.log("克隆仓库失败", "ERROR")
-                self.end_stage("Git操作", "failed", "克隆仓库失败")
+                self.end_stage(Stage.GIT, "failed", "克隆仓库失败")
                 return False
 
             # 创建特性分支
             self.log(f"正在创建分支: {feature_branch}")
             if not self.git.create_branch(feature_branch):
                 self.log(f"创建分支 {feature_branch} 失败", "ERROR")
-                self.end_stage("Git操作", "failed", f"创建分支 {feature_branch} 失败")
+                self.end_stage(Stage.GIT, "failed", f"创建分支 {feature_branch} 失败")
                 return False
 
             # 应用文件修改
@@ -210,7 +279,7 @@ class AutoDeployment:
                 self.log(f"应用 {len(file_changes)} 个文件修改...")
                 if not self.git.apply_file_changes(file_changes):
                     self.log("应用文件修改失败", "ERROR")
-                    self.end_stage("Git操作", "failed", "应用文件修改失败")
+                    self.end_stage(Stage.GIT, "failed", "应用文件修改失败")
                     return False
 
             # 提交修改
@@ -218,23 +287,23 @@ class AutoDeployment:
             self.log(f"提交修改: {commit_message}")
             if not self.git.commit(commit_message):
                 self.log("提交修改失败", "ERROR")
-                self.end_stage("Git操作", "failed", "提交修改失败")
+                self.end_stage(Stage.GIT, "failed", "提交修改失败")
                 return False
 
             # 推送分支
             self.log(f"推送分支: {feature_branch}")
             if not self.git.push(feature_branch):
                 self.log(f"推送分支 {feature_branch} 失败", "ERROR")
-                self.end_stage("Git操作", "failed", f"推送分支 {feature_branch} 失败")
+                self.end_stage(Stage.GIT, "failed", f"推送分支 {feature_branch} 失败")
                 return False
 
             self.log("Git操作完成")
-            self.end_stage("Git操作", "success", "Git操作成功完成")
+            self.end_stage(Stage.GIT, "success", "Git操作成功完成")
             return True
 
         except Exception as e:
             self.log(f"Git操作阶段出错: {str(e)}", "ERROR")
-            self.end_stage("Git操作", "failed", f"Git操作失败: {str(e)}")
+            self.end_stage(Stage.GIT, "failed", f"Git操作失败: {str(e)}")
             return False
 
     def jenkins_build_stage(self, analysis_result):
@@ -251,7 +320,7 @@ class AutoDeployment:
             self.log("未配置Jenkins作业，跳过构建阶段", "WARNING")
             return True
 
-        stage_id = self.start_stage("Jenkins构建", "触发Jenkins构建并等待结果")
+        stage_id = self.start_stage(Stage.JENKINS, "触发Jenkins构建并等待结果")
 
         try:
             # 获取Jenkins构建参数
@@ -259,12 +328,13 @@ class AutoDeployment:
 
             # 添加默认参数
             if "BRANCH" not in jenkins_params:
-                jenkins_params["BRANCH"] = f"feature/auto-update-{int(time.time())}"
+                jenkins_params["BRANCH"] = self.feature_branch
 
             self.log(f"触发Jenkins作业: {self.jenkins_job}")
             self.log(f"构建参数: {jenkins_params}")
 
             # 通知MCP构建开始
+            from modules.mcp_protocol import notify_build_start
             notify_build_start(self.project_name, jenkins_params.get(
                 "BUILD_ID", "auto"), jenkins_params)
 
@@ -274,7 +344,7 @@ class AutoDeployment:
 
             if not build_number:
                 self.log("触发Jenkins构建失败", "ERROR")
-                self.end_stage("Jenkins构建", "failed", "触发Jenkins构建失败")
+                self.end_stage(Stage.JENKINS, "failed", "触发Jenkins构建失败")
                 return False
 
             self.log(f"已触发构建 #{build_number}，等待构建完成...")
@@ -285,12 +355,12 @@ class AutoDeployment:
 
             if not build_status:
                 self.log("等待Jenkins构建超时", "WARNING")
-                self.end_stage("Jenkins构建", "warning", "等待Jenkins构建超时")
+                self.end_stage(Stage.JENKINS, "warning", "等待Jenkins构建超时")
                 return True
 
             if build_status == "SUCCESS":
                 self.log(f"构建成功完成: {self.jenkins_job} #{build_number}")
-                self.end_stage("Jenkins构建", "success",
+                self.end_stage(Stage.JENKINS, "success",
                                f"构建成功: #{build_number}")
                 return True
             else:
@@ -303,12 +373,12 @@ class AutoDeployment:
                 if build_log:
                     self.log(f"构建日志片段:\n{build_log[-1000:]}", "ERROR")
 
-                self.end_stage("Jenkins构建", "failed", f"构建失败: {build_status}")
+                self.end_stage(Stage.JENKINS, "failed", f"构建失败: {build_status}")
                 return False
 
         except Exception as e:
             self.log(f"Jenkins构建阶段出错: {str(e)}", "ERROR")
-            self.end_stage("Jenkins构建", "failed", f"Jenkins构建失败: {str(e)}")
+            self.end_stage(Stage.JENKINS, "failed", f"Jenkins构建失败: {str(e)}")
             return False
 
     def notification_stage(self, status, details=None):
@@ -322,12 +392,12 @@ class AutoDeployment:
         Returns:
             bool: 操作是否成功
         """
-        stage_id = self.start_stage("消息通知", "发送部署状态通知")
+        stage_id = self.start_stage(Stage.NOTIFY, "发送部署状态通知")
 
         try:
             # 生成通知详情
             if not details:
-                duration = int(time.time() - self.start_time)
+                duration = self._duration()
                 minutes, seconds = divmod(duration, 60)
 
                 details = f"""
@@ -348,27 +418,26 @@ class AutoDeployment:
             )
 
             # 检查结果
-            success_count = sum(
-                1 for success in notification_results.values() if success)
+            success_count = sum(notification_results.values())
             total_count = len(notification_results)
 
             if success_count == total_count:
                 self.log(f"所有通知发送成功: {success_count}/{total_count}")
-                self.end_stage("消息通知", "success", "所有通知发送成功")
+                self.end_stage(Stage.NOTIFY, "success", "所有通知发送成功")
                 return True
             elif success_count > 0:
                 self.log(f"部分通知发送成功: {success_count}/{total_count}", "WARNING")
-                self.end_stage("消息通知", "warning",
+                self.end_stage(Stage.NOTIFY, "warning",
                                f"部分通知发送成功 ({success_count}/{total_count})")
                 return True
             else:
                 self.log("所有通知发送失败", "ERROR")
-                self.end_stage("消息通知", "failed", "所有通知发送失败")
+                self.end_stage(Stage.NOTIFY, "failed", "所有通知发送失败")
                 return False
 
         except Exception as e:
             self.log(f"消息通知阶段出错: {str(e)}", "ERROR")
-            self.end_stage("消息通知", "failed", f"消息通知失败: {str(e)}")
+            self.end_stage(Stage.NOTIFY, "failed", f"消息通知失败: {str(e)}")
             return False
 
     def close_session(self, status, summary=None):
@@ -381,7 +450,7 @@ class AutoDeployment:
         """
         if self.mcp and self.session_id:
             if not summary:
-                duration = int(time.time() - self.start_time)
+                duration = self._duration()
                 minutes, seconds = divmod(duration, 60)
 
                 if status == "success":
@@ -391,6 +460,8 @@ class AutoDeployment:
 
             self.log(f"关闭MCP会话: {status}")
             self.mcp.close_session(status, summary)
+            # 会话关闭后不再向MCP上报，后续日志只在本地输出
+            self.mcp = None
 
     def run(self, doc_text):
         """
@@ -403,6 +474,10 @@ class AutoDeployment:
             Dict[str, Any]: 部署结果
         """
         try:
+            # 需求分析不依赖MCP会话，先提交到后台，与会话创建、仓库克隆同时进行
+            self._analysis_future = self._pool.submit(analyze_requirements, doc_text)
+            self._clone_future = self._pool.submit(self.git.clone)
+
             self.log(f"开始自动部署流程: {self.project_name}")
 
             # 更新MCP会话状态
@@ -415,6 +490,9 @@ class AutoDeployment:
                 self.close_session("failed", "需求解析阶段失败")
                 return {"success": False, "stage": "需求解析", "error": "需求分析失败"}
 
+            # 特性分支名在Git操作与Jenkins构建阶段间共用
+            self.feature_branch = f"feature/auto-update-{int(time.time())}"
+
             # 2. Git操作阶段
             git_success = self.git_operations_stage(analysis_result)
             if not git_success:
@@ -438,7 +516,7 @@ class AutoDeployment:
             return {
                 "success": True,
                 "analysis_result": analysis_result,
-                "duration": int(time.time() - self.start_time)
+                "duration": self._duration()
             }
 
         except Exception as e:
@@ -455,53 +533,89 @@ class AutoDeployment:
 
             return {"success": False, "error": str(e)}
 
+        finally:
+            self._cancel_background()
+            self._pool.shutdown(wait=False)
+
+    def _cancel_background(self):
+        """
+        流程提前结束时处理尚未使用的后台任务
+
+        取消还未开始的需求分析和仓库克隆；克隆已在执行时等待其结束，再删除工作目录，
+        避免线程池中的克隆阻塞进程退出并留下临时目录。
+        """
+        if self._analysis_future is not None:
+            self._analysis_future.cancel()
+            self._analysis_future = None
+
+        if self._clone_future is not None:
+            if not self._clone_future.cancel():
+                try:
+                    self._clone_future.result()
+                except Exception as e:
+                    logger.error(f"后台克隆仓库时出错: {str(e)}")
+            self.git.cleanup()
+            self._clone_future = None
+
 
 def main():
     """主程序入口"""
-    parser = argparse.ArgumentParser(description="自动化部署系统")
+    try:
+        parser = argparse.ArgumentParser(description="自动化部署系统")
 
-    parser.add_argument("--project", "-p", required=True, help="项目名称")
-    parser.add_argument("--repo", "-r", required=True, help="Git仓库URL")
-    parser.add_argument("--job", "-j", help="Jenkins作业名称")
-    parser.add_argument("--doc", "-d", help="需求文档文件路径")
-    parser.add_argument("--no-mcp", action="store_true", help="禁用MCP监控")
+        parser.add_argument("--project", "-p", required=True, help="项目名称")
+        parser.add_argument("--repo", "-r", required=True, help="Git仓库URL")
+        parser.add_argument("--job", "-j", help="Jenkins作业名称")
+        parser.add_argument("--doc", "-d", help="需求文档文件路径")
+        parser.add_argument("--no-mcp", action="store_true", help="禁用MCP监控")
 
-    args = parser.parse_args()
+        args = parser.parse_args()
 
-    # 读取需求文档
-    if args.doc:
-        try:
-            with open(args.doc, 'r', encoding='utf-8') as f:
-                doc_text = f.read()
-        except Exception as e:
-            logger.error(f"读取需求文档失败: {str(e)}")
-            sys.exit(1)
-    else:
-        print("请输入需求文档内容 (按Ctrl+D结束输入):")
-        try:
-            doc_text = sys.stdin.read()
-        except KeyboardInterrupt:
-            print("\n已取消输入")
+        # 读取需求文档
+        if args.doc:
+            try:
+                # 普通文件通过mmap直接解码，避免大文件的中间缓冲拷贝；
+                # 管道、/proc等文件的大小为0或不可映射，直接读取
+                with open(args.doc, 'rb') as f:
+                    st = os.fstat(f.fileno())
+                    if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                            doc_text = str(mm, 'utf-8')
+                    else:
+                        doc_text = f.read().decode('utf-8')
+            except Exception as e:
+                logger.error(f"读取需求文档失败: {str(e)}")
+                sys.exit(1)
+        else:
+            print("请输入需求文档内容 (按Ctrl+D结束输入):")
+            try:
+                doc_text = sys.stdin.read()
+            except KeyboardInterrupt:
+                print("\n已取消输入")
+                sys.exit(0)
+
+        # 创建并运行自动部署流程
+        deployment = AutoDeployment(
+            project_name=args.project,
+            git_repo=args.repo,
+            jenkins_job=args.job,
+            mcp_monitor=not args.no_mcp
+        )
+
+        result = deployment.run(doc_text)
+
+        # 输出结果
+        if result["success"]:
+            print(f"✅ 自动部署流程成功完成！耗时: {result['duration']}秒")
             sys.exit(0)
+        else:
+            print(
+                f"❌ 自动部署流程失败: {result.get('stage', '未知阶段')} - {result.get('error', '未知错误')}")
+            sys.exit(1)
 
-    # 创建并运行自动部署流程
-    deployment = AutoDeployment(
-        project_name=args.project,
-        git_repo=args.repo,
-        jenkins_job=args.job,
-        mcp_monitor=not args.no_mcp
-    )
-
-    result = deployment.run(doc_text)
-
-    # 输出结果
-    if result["success"]:
-        print(f"✅ 自动部署流程成功完成！耗时: {result['duration']}秒")
-        sys.exit(0)
-    else:
-        print(
-            f"❌ 自动部署流程失败: {result.get('stage', '未知阶段')} - {result.get('error', '未知错误')}")
-        sys.exit(1)
+    finally:
+        # 确保队列中的日志全部写出
+        _log_listener.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+"""
+兼容模块 - 可选依赖的统一探测与回退
+"""
+
+import json
+import importlib.util
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 优先使用orjson编解码JSON，未安装时回退到标准库
+_json_loads = orjson.loads if orjson else json.loads
+
+
+def _json_dumps(obj):
+    """将请求体编码为UTF-8 JSON字节串"""
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+# 安装了h2时httpx客户端启用HTTP/2多路复用
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
@@ -0,0 +1,41 @@
+"""
+SSE解析模块 - 供各API客户端共用的流式响应切分
+"""
+
+
+def iter_sse_data(response, chunk_size=8192):
+    """
+    逐行解析SSE流式响应，返回各 data 字段的内容
+
+    行尾兼容 \\n 与 \\r\\n；跨块的半行留在缓冲区中，与下一块拼接后再处理。
+
+    Args:
+        response: 流式响应对象
+        chunk_size (int): 每次读取的字节数
+
+    Returns:
+        Iterator[bytes]: 去掉 "data:" 前缀及其后一个空格的数据
+    """
+    buf = b""
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        lines = (buf + chunk).split(b"\n")
+        # 最后一段可能是不完整的行，留到下一块
+        buf = lines.pop()
+        for line in lines:
+            data = _data_field(line)
+            if data is not None:
+                yield data
+
+    data = _data_field(buf)
+    if data is not None:
+        yield data
+
+
+def _data_field(line):
+    """取出一行中的 data 字段内容，非数据行（空行、event: 等）返回None"""
+    if line.endswith(b"\r"):
+        line = line[:-1]
+    if not line.startswith(b"data:"):
+        return None
+    data = line[5:]
+    return data[1:] if data.startswith(b" ") else data
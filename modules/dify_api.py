@@ -2,17 +2,20 @@
 Dify API模块 - 调用Dify大模型进行需求解析
 """
 
-from config import DIFY_API_KEY, DIFY_API_URL
+from config import DIFY_API_KEY, DIFY_API_URL, DIFY_CACHE_DIR, DIFY_CACHE_TTL
+import os
 import json
+import time
+import hashlib
+import tempfile
 import requests
 import logging
-import sys
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+from modules._sse import iter_sse_data
+from modules._compat import _json_loads
 
-# 添加项目根目录到路径
-sys.path.append('..')
-
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
@@ -27,6 +30,20 @@ class DifyClient:
             "Content-Type": "application/json"
         }
 
+        # 复用连接池，避免每次请求重新握手
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        self._session.mount("https://", HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=10,
+            max_retries=Retry(total=3, backoff_factor=0.5,
+                              status_forcelist=[502, 503, 504])
+        ))
+
+    def close(self):
+        """关闭底层HTTP会话"""
+        self._session.close()
+
     def generate(self, prompt, conversation_id=None, stream=False):
         """向Dify发送请求并获取响应"""
         try:
@@ -43,15 +60,15 @@ class DifyClient:
                 payload["conversation_id"] = conversation_id
 
             if stream:
-                response = requests.post(
-                    endpoint, json=payload, headers=self.headers, stream=True)
+                response = self._session.post(
+                    endpoint, json=payload, stream=True)
                 response.raise_for_status()
                 return self._handle_stream_response(response)
             else:
-                response = requests.post(
-                    endpoint, json=payload, headers=self.headers)
+                response = self._session.post(endpoint, json=payload)
                 response.raise_for_status()
-                return self._handle_blocking_response(response.json())
+                return self._handle_blocking_response(
+                    _json_loads(response.content))
 
         except Exception as e:
             logger.error(f"调用Dify API时出错: {str(e)}")
@@ -68,35 +85,48 @@ class DifyClient:
     def _handle_stream_response(self, response):
         """处理流式响应"""
         full_response = ""
-        for line in response.iter_lines():
-            if line:
+        try:
+            for data in iter_sse_data(response):
                 try:
-                    line_data = json.loads(line.decode(
-                        'utf-8').replace('data: ', ''))
+                    line_data = _json_loads(data)
                     if 'answer' in line_data:
                         chunk = line_data.get('answer', '')
                         full_response += chunk
                         yield chunk
                 except Exception as e:
                     logger.error(f"解析流式响应时出错: {str(e)}")
+        finally:
+            # 调用方提前结束迭代时释放连接
+            response.close()
         return full_response
 
 
-def analyze_requirements(doc_text):
+def _decode_stream(chunks):
     """
-    根据需求文档分析并生成代码修改方案
+    接收完整的流式响应后解析JSON
+
+    流结束后只解析一次，不在每段到达时重复解析整个缓冲区；JSON值之后
+    还有非空白内容时视为解析失败，与一次性解析完整响应的结果一致。
 
     Args:
-        doc_text (str): 需求文档文本内容
+        chunks (Iterator[str]): 流式响应文本片段
 
     Returns:
-        dict: 包含修改方案的字典
+        Tuple[Optional[Any], str]: 解析结果（失败为None）和已接收的文本
     """
-    client = DifyClient()
+    text = "".join(chunks)
+    try:
+        return _json_loads(text), text
+    except ValueError:
+        return None, text
 
-    prompt = f"""
+
+# 需求解析提示词模板的固定部分
+_PROMPT_HEAD = """
     根据以下需求文档生成代码修改方案：
-    {doc_text}
+    """
+
+_PROMPT_TAIL = """
     
     输出格式要求：
     1. 需要修改的文件路径列表
@@ -105,30 +135,101 @@ def analyze_requirements(doc_text):
     4. Jenkins构建参数建议
     
     以JSON格式输出，结构如下:
-    {{
+    {
         "files_to_modify": ["path/to/file1", "path/to/file2"],
-        "file_changes": {{
+        "file_changes": {
             "path/to/file1": "diff内容",
             "path/to/file2": "diff内容"
-        }},
+        },
         "git_strategy": "分支策略描述",
-        "jenkins_params": {{
+        "jenkins_params": {
             "param1": "value1",
             "param2": "value2"
-        }}
-    }}
+        }
+    }
     """
 
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client():
+    """获取共享的DifyClient实例，复用其连接池"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DifyClient()
+    return _client
+
+
+def _cache_path(doc_text):
+    """需求文档对应的缓存文件路径"""
+    key = hashlib.sha256(doc_text.encode('utf-8')).hexdigest()
+    return os.path.join(DIFY_CACHE_DIR, f"{key}.json")
+
+
+def _load_cached_result(doc_text):
+    """读取未过期的缓存解析结果，未命中返回None"""
+    path = _cache_path(doc_text)
     try:
-        response = client.generate(prompt)
-        # 尝试解析JSON响应
+        if time.time() - os.path.getmtime(path) > DIFY_CACHE_TTL:
+            return None
+        with open(path, 'rb') as f:
+            return _json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_result(doc_text, result):
+    """原子写入解析结果缓存"""
+    try:
+        os.makedirs(DIFY_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=DIFY_CACHE_DIR, suffix='.tmp')
         try:
-            parsed_response = json.loads(response)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, _cache_path(doc_text))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.warning(f"写入需求解析缓存失败: {str(e)}")
+
+
+def analyze_requirements(doc_text, force_refresh=False):
+    """
+    根据需求文档分析并生成代码修改方案
+
+    Args:
+        doc_text (str): 需求文档文本内容
+        force_refresh (bool): 是否忽略缓存重新调用Dify
+
+    Returns:
+        dict: 包含修改方案的字典
+    """
+    if not force_refresh:
+        cached = _load_cached_result(doc_text)
+        if cached is not None:
+            logger.info("命中需求解析缓存，跳过Dify调用")
+            return cached
+
+    client = _get_client()
+
+    prompt = _PROMPT_HEAD + doc_text + _PROMPT_TAIL
+
+    try:
+        # 流式接收，边接收边产出文本片段，结束后一次解析
+        parsed_response, response = _decode_stream(
+            client.generate(prompt, stream=True))
+        if parsed_response is not None:
+            _save_cached_result(doc_text, parsed_response)
             return parsed_response
-        except json.JSONDecodeError:
-            # 如果无法解析为JSON，返回原始文本
-            logger.warning("无法将Dify响应解析为JSON，返回原始文本")
-            return {"raw_response": response}
+
+        # 如果无法解析为JSON，返回原始文本
+        logger.warning("无法将Dify响应解析为JSON，返回原始文本")
+        return {"raw_response": response}
 
     except Exception as e:
         logger.error(f"分析需求时出错: {str(e)}")
@@ -136,6 +237,9 @@ def analyze_requirements(doc_text):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # 测试用例
     test_doc = """
     需求：优化用户登录流程，增加验证码功能，并支持第三方登录
@@ -2,27 +2,128 @@
 Git操作模块 - 管理代码版本控制
 """
 
-from config import GIT_USERNAME, GIT_TOKEN, DEFAULT_BRANCH
+from config import GIT_USERNAME, GIT_TOKEN, GIT_EMAIL, DEFAULT_BRANCH, GIT_WORKSPACE_ROOT
 import os
 import sys
+import time
+import queue
+import atexit
 import logging
+import functools
+import contextlib
 import subprocess
+import threading
+from urllib.parse import urlsplit, urlunsplit
+from concurrent.futures import ThreadPoolExecutor
 from git import Repo, GitCommandError
 import tempfile
-import shutil
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
 
 # 添加项目根目录到路径
 sys.path.append('..')
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 两种实现可能抛出的Git错误
+GIT_ERRORS = (GitCommandError,) + ((pygit2.GitError,) if pygit2 else ())
+
+# 写入修改文件时的缓冲区大小
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# 按规范化仓库URL区分的锁，同一仓库的操作串行执行，不同仓库可并行
+_repo_locks = {}
+_repo_locks_guard = threading.Lock()
+# 记录当前线程的加锁层数，嵌套调用时不重复占用全局并发名额
+_lock_state = threading.local()
+
+
+def _default_max_workers():
+    """默认并发数，Git操作以网络I/O为主，可适当多于CPU核数的一半"""
+    return max(3, 3 * (os.cpu_count() or 1) // 4)
+
+
+# 全进程同时进行的Git操作数上限，避免压垮Git服务器
+_git_slots = threading.BoundedSemaphore(_default_max_workers())
+
+
+def fast_rmtree(path):
+    """
+    递归删除目录，依赖 DirEntry 缓存的类型信息，不再对每个条目额外 lstat
+
+    Args:
+        path (str): 要删除的目录
+    """
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                fast_rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+    os.rmdir(path)
+
+
+def _cleanup_worker():
+    """后台线程：删除队列中的临时目录，收到None时退出"""
+    while True:
+        path = _cleanup_queue.get()
+        if path is None:
+            break
+        try:
+            fast_rmtree(path)
+            logger.info(f"已清理临时工作目录: {path}")
+        except Exception as e:
+            logger.error(f"清理临时目录时出错: {str(e)}")
+
+
+def _stop_cleanup_worker():
+    """进程退出前删除剩余的临时目录"""
+    _cleanup_queue.put(None)
+    _cleanup_thread.join()
+
+
+# 临时目录在后台删除，避免析构时阻塞
+_cleanup_queue = queue.Queue()
+_cleanup_thread = threading.Thread(
+    target=_cleanup_worker, name="git-workspace-cleanup", daemon=True)
+_cleanup_thread.start()
+atexit.register(_stop_cleanup_worker)
+
+
+def _locked(method):
+    """修改仓库的操作在仓库锁内执行"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with repo_lock(self.repo_url):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+if pygit2 is not None:
+    class _RemoteCallbacks(pygit2.RemoteCallbacks):
+        """记录推送时服务端拒绝的引用，libgit2默认忽略这些拒绝"""
+
+        def __init__(self, credentials=None):
+            super().__init__(credentials=credentials)
+            self.rejected = {}
+
+        def push_update_reference(self, refname, message):
+            """服务端返回的引用更新结果，message不为None表示该引用被拒绝"""
+            if message is not None:
+                self.rejected[refname] = message
+
 
 class GitOperator:
     """Git仓库操作类"""
 
-    def __init__(self, repo_url, username=GIT_USERNAME, token=GIT_TOKEN, work_dir=None):
+    # 距上次与远程同步不超过该时间（秒）时，创建分支不再重新fetch
+    FETCH_TTL = 60
+
+    def __init__(self, repo_url, username=GIT_USERNAME, token=GIT_TOKEN, work_dir=None,
+                 email=GIT_EMAIL):
         """
         初始化Git操作类
 
@@ -31,12 +132,16 @@ class GitOperator:
             username (str): Git用户名
             token (str): Git访问令牌
             work_dir (str, optional): 工作目录路径，如果为None则创建临时目录
+            email (str): 仓库未配置 user.email 时使用的提交者邮箱
         """
         self.repo_url = repo_url
         self.username = username
         self.token = token
+        self.email = email
         self.repo = None
         self.is_temp_dir = work_dir is None
+        # 上次clone/fetch的时间（time.monotonic()）
+        self._last_fetch = 0.0
 
         # 处理认证的仓库URL
         if "http" in repo_url:
@@ -46,28 +151,57 @@ class GitOperator:
         else:
             self.auth_repo_url = repo_url
 
+        # 已安装pygit2时，HTTP(S)仓库的操作在进程内通过libgit2完成，
+        # 不再为每个命令启动git子进程
+        self.pg_repo = None
+        self.use_pygit2 = pygit2 is not None and "http" in repo_url
+        if self.use_pygit2:
+            self.callbacks = _RemoteCallbacks(
+                credentials=pygit2.UserPass(username, token))
+
         # 设置工作目录
         if work_dir:
             self.work_dir = work_dir
         else:
-            self.work_dir = tempfile.mkdtemp(prefix="git_workspace_")
+            # 未配置 GIT_WORKSPACE_ROOT 时使用系统默认临时目录；可按需指向
+            # /dev/shm 等内存文件系统，但需自行确保空间足够容纳仓库
+            self.work_dir = tempfile.mkdtemp(
+                prefix="git_workspace_", dir=GIT_WORKSPACE_ROOT)
             logger.info(f"创建临时工作目录: {self.work_dir}")
 
     def __del__(self):
         """析构函数，清理临时目录"""
+        self.cleanup()
+
+    def cleanup(self):
+        """删除自动创建的临时工作目录，可重复调用"""
         if hasattr(self, 'is_temp_dir') and self.is_temp_dir and hasattr(self, 'work_dir'):
+            self.is_temp_dir = False
+            if _cleanup_thread.is_alive():
+                _cleanup_queue.put(self.work_dir)
+                return
+
+            # 后台线程已退出（解释器关闭阶段），直接删除
             try:
-                shutil.rmtree(self.work_dir)
+                fast_rmtree(self.work_dir)
                 logger.info(f"已清理临时工作目录: {self.work_dir}")
             except Exception as e:
                 logger.error(f"清理临时目录时出错: {str(e)}")
 
-    def clone(self, branch=DEFAULT_BRANCH):
+    @_locked
+    def clone(self, branch=DEFAULT_BRANCH, depth=1, single_branch=True,
+              filter_blobs=False):
         """
         克隆仓库到工作目录
 
+        默认只克隆指定分支的最新一次提交，部署流程不需要完整历史。
+
         Args:
             branch (str): 要克隆的分支名称
+            depth (int): 克隆深度，0或None表示完整历史
+            single_branch (bool): 是否只克隆指定分支
+            filter_blobs (bool): 是否使用部分克隆（--filter=blob:none），
+                按需下载文件内容
 
         Returns:
             bool: 操作是否成功
@@ -75,20 +209,53 @@ class GitOperator:
         try:
             logger.info(
                 f"正在克隆仓库 {self.repo_url} 的 {branch} 分支到 {self.work_dir}")
-            self.repo = Repo.clone_from(
-                self.auth_repo_url, self.work_dir, branch=branch)
+            # libgit2不支持部分克隆，此时改用git命令行
+            if self.use_pygit2 and not filter_blobs:
+                def create_remote(repo, name, url):
+                    # 只跟踪要克隆的分支（pygit2以bytes传入名称和地址）
+                    name, url = name.decode(), url.decode()
+                    return repo.remotes.create(
+                        name, url,
+                        f"+refs/heads/{branch}:refs/remotes/{name}/{branch}")
+
+                self.pg_repo = pygit2.clone_repository(
+                    self.repo_url, self.work_dir,
+                    remote=create_remote if single_branch else None,
+                    checkout_branch=branch, callbacks=self.callbacks,
+                    depth=depth or 0)
+                # 补丁、回滚等不常用操作仍通过GitPython执行
+                self.repo = Repo(self.work_dir)
+            else:
+                multi_options = []
+                if depth:
+                    multi_options.append(f"--depth={depth}")
+                if single_branch:
+                    multi_options.append("--single-branch")
+                if filter_blobs:
+                    multi_options.append("--filter=blob:none")
+
+                self.repo = Repo.clone_from(
+                    self.auth_repo_url, self.work_dir, branch=branch,
+                    multi_options=multi_options)
+                self.pg_repo = None
+            self._last_fetch = time.monotonic()
             return True
-        except GitCommandError as e:
+        except GIT_ERRORS as e:
             logger.error(f"克隆仓库失败: {str(e)}")
             return False
 
-    def create_branch(self, branch_name, base_branch=DEFAULT_BRANCH):
+    @_locked
+    def create_branch(self, branch_name, base_branch=DEFAULT_BRANCH,
+                      force_fetch=False):
         """
         创建新分支
 
+        刚clone或fetch过时直接使用本地的远程分支信息，不再重复fetch。
+
         Args:
             branch_name (str): 新分支名称
             base_branch (str): 基础分支名称
+            force_fetch (bool): 是否无论何时都先从远程fetch
 
         Returns:
             bool: 操作是否成功
@@ -98,16 +265,23 @@ class GitOperator:
                 logger.error("仓库未克隆，无法创建分支")
                 return False
 
+            need_fetch = force_fetch or self._fetch_expired()
+
+            if self.pg_repo:
+                return self._create_branch_pygit2(
+                    branch_name, base_branch, need_fetch)
+
             # 确保基础分支存在且为最新
-            origin = self.repo.remotes.origin
-            origin.fetch()
+            if need_fetch:
+                self.repo.remotes.origin.fetch()
+                self._last_fetch = time.monotonic()
 
             # 检查分支是否已存在
-            for ref in self.repo.refs:
-                if ref.name == branch_name or ref.name == f"origin/{branch_name}":
-                    logger.warning(f"分支 {branch_name} 已存在，将切换到该分支")
-                    self.repo.git.checkout(branch_name)
-                    return True
+            ref_names = {ref.name for ref in self.repo.refs}
+            if branch_name in ref_names or f"origin/{branch_name}" in ref_names:
+                logger.warning(f"分支 {branch_name} 已存在，将切换到该分支")
+                self.repo.git.checkout(branch_name)
+                return True
 
             # 创建并切换到新分支
             base = f"origin/{base_branch}"
@@ -115,10 +289,46 @@ class GitOperator:
             logger.info(f"已创建并切换到新分支: {branch_name}")
             return True
 
-        except GitCommandError as e:
+        except GIT_ERRORS as e:
             logger.error(f"创建分支失败: {str(e)}")
             return False
 
+    def _fetch_expired(self):
+        """距上次与远程同步是否已超过 FETCH_TTL"""
+        return time.monotonic() - self._last_fetch > self.FETCH_TTL
+
+    def _create_branch_pygit2(self, branch_name, base_branch, need_fetch=True):
+        """通过pygit2创建并切换分支，语义与 create_branch 相同"""
+        repo = self.pg_repo
+        if need_fetch:
+            repo.remotes["origin"].fetch(callbacks=self.callbacks)
+            self._last_fetch = time.monotonic()
+
+        # 检查分支是否已存在
+        branch = repo.branches.local.get(branch_name)
+        if branch is None:
+            remote_branch = repo.branches.remote.get(f"origin/{branch_name}")
+            if remote_branch is not None:
+                branch = repo.branches.local.create(
+                    branch_name, remote_branch.peel(pygit2.Commit))
+                branch.upstream = remote_branch
+        if branch is not None:
+            logger.warning(f"分支 {branch_name} 已存在，将切换到该分支")
+            repo.checkout(branch)
+            return True
+
+        # 创建并切换到新分支
+        base = repo.branches.remote.get(f"origin/{base_branch}")
+        if base is None:
+            logger.error(f"创建分支失败: 远程分支 origin/{base_branch} 不存在")
+            return False
+        branch = repo.branches.local.create(
+            branch_name, base.peel(pygit2.Commit))
+        repo.checkout(branch)
+        logger.info(f"已创建并切换到新分支: {branch_name}")
+        return True
+
+    @_locked
     def apply_file_changes(self, file_changes):
         """
         应用文件修改
@@ -134,17 +344,32 @@ class GitOperator:
                 logger.error("仓库未克隆，无法应用修改")
                 return False
 
+            created_dirs = set()
             for file_path, content in file_changes.items():
                 full_path = os.path.join(self.work_dir, file_path)
-                # 确保文件目录存在
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-                # 写入文件内容
-                with open(full_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-
-                # 添加到git
-                self.repo.git.add(file_path)
+                # 确保文件目录存在，每个目录只创建一次
+                dir_path = os.path.dirname(full_path)
+                if dir_path not in created_dirs:
+                    os.makedirs(dir_path, exist_ok=True)
+                    created_dirs.add(dir_path)
+
+                # 写入文件内容，使用大缓冲区减少写入次数
+                if isinstance(content, bytes):
+                    with open(full_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                        f.write(content)
+                else:
+                    with open(full_path, 'w', encoding='utf-8',
+                              buffering=WRITE_BUFFER_SIZE) as f:
+                        f.write(content)
+
+            # 一次性添加到git
+            if self.pg_repo:
+                index = self.pg_repo.index
+                for file_path in file_changes:
+                    index.add(file_path)
+                index.write()
+            elif file_changes:
+                self.repo.git.add('--', *file_changes)
 
             logger.info(f"已应用 {len(file_changes)} 个文件的修改")
             return True
@@ -153,13 +378,14 @@ class GitOperator:
             logger.error(f"应用文件修改失败: {str(e)}")
             return False
 
+    @_locked
     def apply_patch(self, patch_content, file_path=None):
         """
         应用补丁
 
         Args:
             patch_content (str): 补丁内容
-            file_path (str, optional): 补丁文件路径，如果为None则创建临时文件
+            file_path (str, optional): 补丁文件路径，如果为None则通过标准输入传入补丁内容
 
         Returns:
             bool: 操作是否成功
@@ -169,35 +395,33 @@ class GitOperator:
                 logger.error("仓库未克隆，无法应用补丁")
                 return False
 
-            # 保存补丁内容到文件
-            temp_patch = None
+            # 应用补丁，未指定文件时通过标准输入传入，无需临时文件
             if file_path:
-                patch_file = file_path
+                self.repo.git.apply(file_path)
             else:
-                temp_patch = tempfile.NamedTemporaryFile(
-                    delete=False, suffix='.patch')
-                patch_file = temp_patch.name
-                temp_patch.write(patch_content.encode('utf-8'))
-                temp_patch.close()
-
-            # 应用补丁
-            try:
-                self.repo.git.apply(patch_file)
-
-                # 添加所有修改到暂存区
-                self.repo.git.add(A=True)
+                subprocess.run(
+                    ["git", "apply"],
+                    input=patch_content.encode('utf-8'),
+                    cwd=self.work_dir,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    check=True
+                )
+
+            # 添加所有修改到暂存区
+            self.repo.git.add(A=True)
 
-                logger.info("补丁应用成功")
-                return True
-            finally:
-                # 清理临时文件
-                if temp_patch:
-                    os.unlink(patch_file)
+            logger.info("补丁应用成功")
+            return True
 
         except GitCommandError as e:
             logger.error(f"应用补丁失败: {str(e)}")
             return False
+        except subprocess.CalledProcessError as e:
+            logger.error(f"应用补丁失败: {e.stderr.decode('utf-8', errors='replace')}")
+            return False
 
+    @_locked
     def commit(self, message):
         """
         提交更改
@@ -213,6 +437,9 @@ class GitOperator:
                 logger.error("仓库未克隆，无法提交更改")
                 return False
 
+            if self.pg_repo:
+                return self._commit_pygit2(message)
+
             # 检查是否有更改需要提交
             if not self.repo.is_dirty() and not self.repo.untracked_files:
                 logger.warning("没有更改需要提交")
@@ -226,10 +453,40 @@ class GitOperator:
             logger.info(f"已提交更改: {message}")
             return True
 
-        except GitCommandError as e:
+        except GIT_ERRORS as e:
             logger.error(f"提交更改失败: {str(e)}")
             return False
 
+    def _commit_pygit2(self, message):
+        """通过pygit2提交全部更改，语义与 commit 相同"""
+        repo = self.pg_repo
+
+        # 检查是否有更改需要提交
+        if not repo.status():
+            logger.warning("没有更改需要提交")
+            return False
+
+        # 添加所有更改
+        index = repo.index
+        index.add_all()
+        index.write()
+        tree = index.write_tree()
+
+        # 提交更改
+        try:
+            signature = repo.default_signature
+        except KeyError:
+            # 未配置 user.name/user.email 时使用配置的Git用户名和邮箱
+            if not self.email:
+                logger.error("仓库未配置 user.email，且未设置 GIT_EMAIL，无法提交更改")
+                return False
+            signature = pygit2.Signature(self.username, self.email)
+        repo.create_commit("HEAD", signature, signature, message, tree,
+                           [repo.head.target])
+        logger.info(f"已提交更改: {message}")
+        return True
+
+    @_locked
     def push(self, branch=None, force=False):
         """
         推送更改到远程仓库
@@ -251,7 +508,18 @@ class GitOperator:
                 branch = self.repo.active_branch.name
 
             # 推送更改
-            if force:
+            if self.pg_repo:
+                refspec = f"refs/heads/{branch}:refs/heads/{branch}"
+                if force:
+                    refspec = "+" + refspec
+                self.callbacks.rejected.clear()
+                self.pg_repo.remotes["origin"].push(
+                    [refspec], callbacks=self.callbacks)
+                if self.callbacks.rejected:
+                    # 非快进、钩子拒绝等情况下push本身不报错，需检查各引用的结果
+                    logger.error(f"推送更改被远程仓库拒绝: {self.callbacks.rejected}")
+                    return False
+            elif force:
                 self.repo.git.push('origin', branch, force=True)
             else:
                 self.repo.git.push('origin', branch)
@@ -259,7 +527,7 @@ class GitOperator:
             logger.info(f"已推送更改到远程分支: {branch}")
             return True
 
-        except GitCommandError as e:
+        except GIT_ERRORS as e:
             logger.error(f"推送更改失败: {str(e)}")
             return False
 
@@ -274,6 +542,7 @@ class GitOperator:
         # 实际实现需调用对应平台API
         return None
 
+    @_locked
     def revert_last_commit(self):
         """
         回滚最后一次提交
@@ -286,6 +555,13 @@ class GitOperator:
                 logger.error("仓库未克隆，无法回滚提交")
                 return False
 
+            # 浅克隆仓库中可能没有上一次提交，需要先加深历史
+            if self.repo.git.rev_parse('--is-shallow-repository') == 'true':
+                try:
+                    self.repo.git.rev_parse('--verify', 'HEAD~1')
+                except GitCommandError:
+                    self.repo.git.fetch('--deepen=1', self.auth_repo_url)
+
             # 回滚最后一次提交
             self.repo.git.reset('--hard', 'HEAD~1')
             logger.info("已回滚最后一次提交")
@@ -296,6 +572,106 @@ class GitOperator:
             return False
 
 
+def canonicalize_repo_url(repo_url):
+    """
+    规范化仓库URL，去掉认证信息和末尾的 .git，使同一仓库的不同写法对应同一把锁
+
+    Args:
+        repo_url (str): 仓库URL
+
+    Returns:
+        str: 规范化后的URL
+    """
+    url = repo_url.strip().rstrip('/')
+    if url.endswith('.git'):
+        url = url[:-4]
+    parts = urlsplit(url)
+    if parts.scheme and parts.hostname:
+        netloc = parts.hostname.lower()
+        if parts.port:
+            netloc = f"{netloc}:{parts.port}"
+        url = urlunsplit((parts.scheme.lower(), netloc, parts.path, '', ''))
+    return url
+
+
+def _get_repo_lock(repo_url):
+    """获取仓库URL对应的锁（同一线程可重入，便于批量操作中嵌套调用）"""
+    key = canonicalize_repo_url(repo_url)
+    with _repo_locks_guard:
+        lock = _repo_locks.get(key)
+        if lock is None:
+            lock = _repo_locks[key] = threading.RLock()
+        return lock
+
+
+@contextlib.contextmanager
+def repo_lock(repo_url):
+    """
+    串行化同一仓库的Git操作，并限制全进程的Git操作并发数
+
+    Args:
+        repo_url (str): 仓库URL
+    """
+    depth = getattr(_lock_state, "depth", 0)
+    if depth == 0:
+        _git_slots.acquire()
+    _lock_state.depth = depth + 1
+    try:
+        with _get_repo_lock(repo_url):
+            yield
+    finally:
+        _lock_state.depth = depth
+        if depth == 0:
+            _git_slots.release()
+
+
+def batch_git(op_fn, operators, max_workers=None):
+    """
+    对多个仓库并行执行Git操作
+
+    同一仓库URL的操作按顺序执行，不同仓库之间并行。各操作在自己的工作目录中
+    执行，不会切换进程的当前目录。
+
+    Args:
+        op_fn (Callable[[GitOperator], Any]): 对单个仓库执行的操作
+        operators (List[GitOperator]): 仓库操作对象列表
+        max_workers (int, optional): 最大并发数
+
+    Returns:
+        list: 各仓库的操作结果，顺序与 operators 一致，出错的项为False
+    """
+    def run(operator):
+        with repo_lock(operator.repo_url):
+            try:
+                return op_fn(operator)
+            except Exception as e:
+                logger.error(f"仓库 {operator.repo_url} 的Git操作出错: {str(e)}")
+                return False
+
+    with ThreadPoolExecutor(max_workers=max_workers or _default_max_workers()) as pool:
+        return list(pool.map(run, operators))
+
+
+def batch_clone(repo_urls, work_dirs=None, max_workers=None, **clone_kwargs):
+    """
+    并行克隆多个仓库
+
+    Args:
+        repo_urls (List[str]): 仓库URL列表
+        work_dirs (List[str], optional): 对应的工作目录，默认各自创建临时目录
+        max_workers (int, optional): 最大并发数
+        **clone_kwargs: 传给 GitOperator.clone 的参数
+
+    Returns:
+        List[GitOperator]: 仓库操作对象列表，克隆失败的对象 repo 为None
+    """
+    work_dirs = work_dirs or [None] * len(repo_urls)
+    operators = [GitOperator(url, work_dir=work_dir)
+                 for url, work_dir in zip(repo_urls, work_dirs)]
+    batch_git(lambda op: op.clone(**clone_kwargs), operators, max_workers)
+    return operators
+
+
 def run_git_command(cmd, cwd=None):
     """
     运行Git命令
@@ -324,6 +700,9 @@ def run_git_command(cmd, cwd=None):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # 测试用例
     test_repo_url = "https://github.com/username/test-repo.git"
     operator = GitOperator(test_repo_url)
@@ -5,22 +5,40 @@ Jenkins操作模块 - 触发和管理Jenkins构建
 from config import JENKINS_URL, JENKINS_USER, JENKINS_TOKEN
 import sys
 import time
+import random
 import logging
 import json
 import requests
-from typing import Dict, List, Any, Optional, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Any, Optional, Union, Iterator, Tuple
+from modules._compat import _json_loads
 
 # 添加项目根目录到路径
 sys.path.append('..')
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def _sleep_backoff(interval: float, deadline: float) -> None:
+    """
+    按退避间隔加随机抖动休眠，不超过截止时间
+
+    Args:
+        interval (float): 本次间隔(秒)
+        deadline (float): time.monotonic() 截止时间
+    """
+    delay = interval + random.uniform(0, 0.25)
+    time.sleep(max(0, min(delay, deadline - time.monotonic())))
+
+
 class JenkinsClient:
     """Jenkins客户端，用于触发和管理Jenkins构建"""
 
+    # 作业信息缓存有效期（秒）
+    JOB_INFO_TTL = 60
+
     def __init__(self, url=JENKINS_URL, username=JENKINS_USER, token=JENKINS_TOKEN):
         """
         初始化Jenkins客户端
@@ -34,7 +52,41 @@ class JenkinsClient:
         self.username = username
         self.token = token
         self.auth = (username, token)
-        self.crumb = self._get_crumb()
+
+        # 所有请求共用一个会话，复用连接
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.3,
+                              status_forcelist=(500, 502, 503, 504))
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # 作业信息缓存 {job_name: (过期时间, 作业信息)} 及是否参数化
+        self._job_info_cache: Dict[str, tuple] = {}
+        self._parameterized: Dict[str, bool] = {}
+
+        # 构建信息的ETag及对应内容，用于条件请求
+        self._etags: Dict[tuple, str] = {}
+        self._last_info: Dict[tuple, Dict[str, Any]] = {}
+
+        # CSRF crumb在首次POST时才获取，crumb失效（403）时重新获取
+        self.crumb: Optional[Dict[str, str]] = None
+        self._crumb_fetched = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """关闭底层HTTP会话"""
+        self.session.close()
 
     def _get_crumb(self) -> Optional[Dict[str, str]]:
         """
@@ -44,13 +96,10 @@ class JenkinsClient:
             Optional[Dict[str, str]]: CSRF crumb信息
         """
         try:
-            response = requests.get(
-                f"{self.url}/crumbIssuer/api/json",
-                auth=self.auth
-            )
+            response = self.session.get(f"{self.url}/crumbIssuer/api/json")
 
             if response.status_code == 200:
-                data = response.json()
+                data = _json_loads(response.content)
                 return {data.get('crumbRequestField'): data.get('crumb')}
             else:
                 logger.warning(
@@ -61,18 +110,46 @@ class JenkinsClient:
             logger.error(f"获取Jenkins CSRF crumb时出错: {str(e)}")
             return None
 
+    def _ensure_crumb(self) -> None:
+        """按需获取CSRF crumb，同一会话内只获取一次"""
+        if not self._crumb_fetched:
+            self.crumb = self._get_crumb()
+            self._crumb_fetched = True
+
     def _get_headers(self) -> Dict[str, str]:
         """
-        获取请求头
+        获取修改类请求的请求头，包含CSRF crumb
 
         Returns:
             Dict[str, str]: 请求头
         """
+        self._ensure_crumb()
         headers = {"Content-Type": "application/json"}
         if self.crumb:
             headers.update(self.crumb)
         return headers
 
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        """
+        发送带CSRF crumb的POST请求，crumb失效时重新获取并重试一次
+
+        crumb与JSESSIONID cookie都保存在共用的会话中，服务端允许时可免去crumb校验。
+
+        Args:
+            url (str): 请求URL
+            **kwargs: 传给 requests.Session.post 的其他参数
+
+        Returns:
+            requests.Response: 响应对象
+        """
+        response = self.session.post(url, headers=self._get_headers(), **kwargs)
+        if response.status_code == 403 and 'crumb' in response.text:
+            logger.info("Jenkins CSRF crumb已失效，重新获取")
+            self._crumb_fetched = False
+            response = self.session.post(
+                url, headers=self._get_headers(), **kwargs)
+        return response
+
     def get_job_info(self, job_name: str) -> Optional[Dict[str, Any]]:
         """
         获取Jenkins作业信息
@@ -83,12 +160,19 @@ class JenkinsClient:
         Returns:
             Optional[Dict[str, Any]]: 作业信息
         """
+        cached = self._job_info_cache.get(job_name)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
         try:
             url = f"{self.url}/job/{job_name}/api/json"
-            response = requests.get(url, auth=self.auth)
+            response = self.session.get(url)
 
             if response.status_code == 200:
-                return response.json()
+                job_info = _json_loads(response.content)
+                self._job_info_cache[job_name] = (
+                    time.monotonic() + self.JOB_INFO_TTL, job_info)
+                return job_info
             else:
                 logger.error(
                     f"获取作业信息失败: {response.status_code} - {response.text}")
@@ -98,6 +182,39 @@ class JenkinsClient:
             logger.error(f"获取作业信息时出错: {str(e)}")
             return None
 
+    def invalidate_job(self, job_name: str) -> None:
+        """
+        清除作业信息缓存
+
+        Args:
+            job_name (str): 作业名称
+        """
+        self._job_info_cache.pop(job_name, None)
+        self._parameterized.pop(job_name, None)
+
+    def _is_parameterized(self, job_name: str) -> bool:
+        """
+        检查作业是否为参数化作业，结果按作业缓存
+
+        Args:
+            job_name (str): 作业名称
+
+        Returns:
+            bool: 是否参数化
+        """
+        if job_name in self._parameterized:
+            return self._parameterized[job_name]
+
+        job_info = self.get_job_info(job_name)
+        if not job_info:
+            return False
+
+        is_parameterized = any(
+            'ParametersDefinitionProperty' in prop.get('_class', '')
+            for prop in job_info.get('property', []))
+        self._parameterized[job_name] = is_parameterized
+        return is_parameterized
+
     def build_job(self, job_name: str, parameters: Dict[str, Any] = None) -> Optional[int]:
         """
         触发Jenkins构建
@@ -111,31 +228,15 @@ class JenkinsClient:
         """
         try:
             # 检查作业是否有参数化
-            job_info = self.get_job_info(job_name)
-            is_parameterized = False
-
-            if job_info:
-                for prop in job_info.get('property', []):
-                    if 'ParametersDefinitionProperty' in prop.get('_class', ''):
-                        is_parameterized = True
-                        break
+            is_parameterized = self._is_parameterized(job_name)
 
             # 构建URL
             if is_parameterized and parameters:
                 url = f"{self.url}/job/{job_name}/buildWithParameters"
-                response = requests.post(
-                    url,
-                    auth=self.auth,
-                    headers=self._get_headers(),
-                    params=parameters
-                )
+                response = self._post(url, params=parameters)
             else:
                 url = f"{self.url}/job/{job_name}/build"
-                response = requests.post(
-                    url,
-                    auth=self.auth,
-                    headers=self._get_headers()
-                )
+                response = self._post(url)
 
             if response.status_code in [200, 201]:
                 # 获取队列项ID
@@ -156,28 +257,30 @@ class JenkinsClient:
             logger.error(f"触发构建时出错: {str(e)}")
             return None
 
-    def _get_build_number_from_queue(self, queue_url: str) -> Optional[int]:
+    def _get_build_number_from_queue(self, queue_url: str, timeout: float = 20,
+                                     min_interval: float = 0.25,
+                                     max_interval: float = 4) -> Optional[int]:
         """
-        从队列URL获取构建编号
+        从队列URL获取构建编号，检查间隔按指数退避递增
 
         Args:
             queue_url (str): 队列项URL
+            timeout (float): 超时时间(秒)
+            min_interval (float): 初始检查间隔(秒)
+            max_interval (float): 最大检查间隔(秒)
 
         Returns:
             Optional[int]: 构建编号
         """
         try:
-            max_attempts = 10
-            attempts = 0
+            deadline = time.monotonic() + timeout
+            interval = min_interval
 
-            while attempts < max_attempts:
-                response = requests.get(
-                    f"{queue_url}api/json",
-                    auth=self.auth
-                )
+            while time.monotonic() < deadline:
+                response = self.session.get(f"{queue_url}api/json")
 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = _json_loads(response.content)
 
                     # 检查队列项是否已转换为构建
                     if 'executable' in data and 'number' in data['executable']:
@@ -189,8 +292,8 @@ class JenkinsClient:
                         return None
 
                     # 如果没有转换为构建，等待后重试
-                    time.sleep(2)
-                    attempts += 1
+                    _sleep_backoff(interval, deadline)
+                    interval = min(interval * 2, max_interval)
                 else:
                     logger.error(f"获取队列信息失败: {response.status_code}")
                     return None
@@ -202,23 +305,40 @@ class JenkinsClient:
             logger.error(f"获取构建编号时出错: {str(e)}")
             return None
 
-    def get_build_info(self, job_name: str, build_number: int) -> Optional[Dict[str, Any]]:
+    def get_build_info(self, job_name: str, build_number: int,
+                       tree: str = None) -> Optional[Dict[str, Any]]:
         """
         获取构建信息
 
         Args:
             job_name (str): 作业名称
             build_number (int): 构建编号
+            tree (str, optional): Jenkins tree过滤表达式，只返回指定字段
 
         Returns:
             Optional[Dict[str, Any]]: 构建信息
         """
+        key = (job_name, build_number, tree)
+
         try:
             url = f"{self.url}/job/{job_name}/{build_number}/api/json"
-            response = requests.get(url, auth=self.auth)
+            params = {"tree": tree} if tree else None
+            headers = {}
+            if key in self._etags:
+                headers["If-None-Match"] = self._etags[key]
+            response = self.session.get(url, params=params, headers=headers)
+
+            # 内容未变化，直接返回上次结果
+            if response.status_code == 304 and key in self._last_info:
+                return self._last_info[key]
 
             if response.status_code == 200:
-                return response.json()
+                build_info = _json_loads(response.content)
+                etag = response.headers.get("ETag")
+                if etag:
+                    self._etags[key] = etag
+                    self._last_info[key] = build_info
+                return build_info
             else:
                 logger.error(
                     f"获取构建信息失败: {response.status_code} - {response.text}")
@@ -239,7 +359,9 @@ class JenkinsClient:
         Returns:
             Optional[str]: 构建状态 (SUCCESS, FAILURE, ABORTED, IN_PROGRESS)
         """
-        build_info = self.get_build_info(job_name, build_number)
+        # 只请求状态相关字段，避免每次轮询下载完整构建信息
+        build_info = self.get_build_info(
+            job_name, build_number, tree="building,result")
 
         if not build_info:
             return None
@@ -252,22 +374,26 @@ class JenkinsClient:
         return build_info.get('result')
 
     def wait_for_build(self, job_name: str, build_number: int,
-                       timeout: int = 600, check_interval: int = 10) -> Optional[str]:
+                       timeout: int = 600, min_interval: float = 1,
+                       max_interval: float = 30, factor: float = 2) -> Optional[str]:
         """
-        等待构建完成
+        等待构建完成，检查间隔按指数退避递增并加入随机抖动
 
         Args:
             job_name (str): 作业名称
             build_number (int): 构建编号
             timeout (int): 超时时间(秒)
-            check_interval (int): 检查间隔(秒)
+            min_interval (float): 初始检查间隔(秒)
+            max_interval (float): 最大检查间隔(秒)
+            factor (float): 间隔增长倍数
 
         Returns:
             Optional[str]: 构建状态
         """
-        start_time = time.time()
+        deadline = time.monotonic() + timeout
+        interval = min_interval
 
-        while time.time() - start_time < timeout:
+        while time.monotonic() < deadline:
             status = self.get_build_status(job_name, build_number)
 
             # 如果构建完成，返回状态
@@ -277,11 +403,72 @@ class JenkinsClient:
 
             # 如果构建还在进行中，等待后重试
             logger.info(f"构建 {job_name} #{build_number} 进行中，等待中...")
-            time.sleep(check_interval)
+            _sleep_backoff(interval, deadline)
+            interval = min(interval * factor, max_interval)
 
         logger.warning(f"等待构建超时: {job_name} #{build_number}")
         return None
 
+    def wait_for_builds(self, builds: List[Tuple[str, int]], timeout: int = 600,
+                        **kwargs) -> Iterator[Tuple[str, int, Optional[str]]]:
+        """
+        并行等待多个构建完成，按完成顺序返回结果
+
+        Args:
+            builds (List[Tuple[str, int]]): (作业名称, 构建编号) 列表
+            timeout (int): 每个构建的超时时间(秒)
+            **kwargs: 传给 wait_for_build 的其他参数
+
+        Returns:
+            Iterator[Tuple[str, int, Optional[str]]]: (作业名称, 构建编号, 构建状态)
+        """
+        if not builds:
+            return
+
+        # 并发数不超过连接池大小，所有线程共用同一会话
+        with ThreadPoolExecutor(max_workers=min(32, len(builds))) as pool:
+            futures = {
+                pool.submit(self.wait_for_build, job_name, build_number,
+                            timeout, **kwargs): (job_name, build_number)
+                for job_name, build_number in builds
+            }
+            for future in as_completed(futures):
+                job_name, build_number = futures[future]
+                yield job_name, build_number, future.result()
+
+    def iter_build_log(self, job_name: str, build_number: int, start: int = 0,
+                       chunk_size: int = 65536, follow: bool = False) -> Iterator[bytes]:
+        """
+        分块流式读取构建日志
+
+        Args:
+            job_name (str): 作业名称
+            build_number (int): 构建编号
+            start (int): 起始字节偏移
+            chunk_size (int): 每次读取的字节数
+            follow (bool): 构建仍在输出日志时是否持续读取
+
+        Returns:
+            Iterator[bytes]: 日志数据块
+
+        Raises:
+            requests.HTTPError: 请求日志失败
+        """
+        url = f"{self.url}/job/{job_name}/{build_number}/logText/progressiveText"
+
+        while True:
+            with self.session.get(url, params={"start": start}, stream=True) as response:
+                response.raise_for_status()
+                yield from response.iter_content(chunk_size=chunk_size)
+
+                # X-Text-Size 为下次读取的起始偏移，X-More-Data 表示日志仍在增长
+                start = int(response.headers.get("X-Text-Size", start))
+                more_data = response.headers.get("X-More-Data") == "true"
+
+            if not (follow and more_data):
+                return
+            time.sleep(1)
+
     def get_build_log(self, job_name: str, build_number: int) -> Optional[str]:
         """
         获取构建日志
@@ -294,14 +481,8 @@ class JenkinsClient:
             Optional[str]: 构建日志
         """
         try:
-            url = f"{self.url}/job/{job_name}/{build_number}/consoleText"
-            response = requests.get(url, auth=self.auth)
-
-            if response.status_code == 200:
-                return response.text
-            else:
-                logger.error(f"获取构建日志失败: {response.status_code}")
-                return None
+            log = b"".join(self.iter_build_log(job_name, build_number))
+            return log.decode("utf-8", errors="replace")
 
         except Exception as e:
             logger.error(f"获取构建日志时出错: {str(e)}")
@@ -320,11 +501,7 @@ class JenkinsClient:
         """
         try:
             url = f"{self.url}/job/{job_name}/{build_number}/stop"
-            response = requests.post(
-                url,
-                auth=self.auth,
-                headers=self._get_headers()
-            )
+            response = self._post(url)
 
             if response.status_code in [200, 201, 302]:
                 logger.info(f"已终止构建: {job_name} #{build_number}")
@@ -340,6 +517,9 @@ class JenkinsClient:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # 测试用例
     client = JenkinsClient()
 
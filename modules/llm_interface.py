@@ -2,20 +2,88 @@
 大模型接口模块 - 调用大模型进行代码分析和生成
 """
 
-from config import LLM_API_KEY, LLM_API_URL, LLM_MODEL
+from config import LLM_API_KEY, LLM_API_URL, LLM_MODEL, LLM_TIMEOUT
+import re
 import json
 import sys
+import asyncio
 import requests
 import logging
-from typing import Dict, List, Any, Optional, Union
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any, Optional, Union, Iterator
+from modules._sse import iter_sse_data
+from modules._compat import _json_loads, _HTTP2_AVAILABLE
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 
 # 添加项目根目录到路径
 sys.path.append('..')
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 整段被代码围栏包裹的响应，以及响应中的第一个代码块；语言标识可选，
+# 其后可以换行，也可以与内容写在同一行（如 ```json {...}```）
+_FENCED_RE = re.compile(r"\s*```(?:[\w+-]*\n|[\w+-]*\s)?(.*?)```\s*", re.S)
+_CODE_BLOCK_RE = re.compile(r"```(?:[\w+-]*\n|[\w+-]*\s)?(.*?)```", re.S)
+
+
+def _strip_fence(text):
+    """去掉包裹整段响应的代码围栏"""
+    match = _FENCED_RE.fullmatch(text)
+    return match.group(1) if match else text
+
+
+if msgspec is not None:
+    class Change(msgspec.Struct):
+        """代码分析结果中的单处修改"""
+        line_start: int
+        line_end: int
+        original: str
+        modified: str
+        reason: str
+
+    class AnalyzeResult(msgspec.Struct):
+        """代码分析结果"""
+        analysis: str
+        changes: List[Change] = []
+        diff: str = ""
+
+    class GenerateResult(msgspec.Struct):
+        """代码生成结果"""
+        code: str
+        explanation: str = ""
+        instructions: str = ""
+else:
+    AnalyzeResult = GenerateResult = None
+
+
+def _decode_typed(text, result_type):
+    """
+    按结构定义解码并校验JSON，由msgspec生成专用解码器
+
+    Args:
+        text (str): JSON文本
+        result_type (type): 结构类型，如 AnalyzeResult
+
+    Returns:
+        Optional[Dict[str, Any]]: 校验通过的结果；未安装msgspec或不符合结构时为None
+    """
+    if result_type is None:
+        return None
+    try:
+        result = msgspec.json.decode(text.encode('utf-8'), type=result_type)
+    except (msgspec.ValidationError, msgspec.DecodeError):
+        return None
+    return msgspec.to_builtins(result)
+
 
 class LLMInterface:
     """大模型接口封装类"""
@@ -37,8 +105,34 @@ class LLMInterface:
             "Content-Type": "application/json"
         }
 
+        # 复用连接池，避免每次请求重新握手
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _completion_payload(self, prompt: str, max_tokens: int, temperature: float,
+                            stream: bool) -> Dict[str, Any]:
+        """构造补全请求体"""
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": stream
+        }
+
+    def _parse_completion(self, response_json: Dict[str, Any]) -> str:
+        """从非流式响应中提取生成文本"""
+        if "choices" in response_json and len(response_json["choices"]) > 0:
+            return response_json["choices"][0]["text"].strip()
+        else:
+            logger.error(f"API响应格式异常: {response_json}")
+            return ""
+
     def generate_completion(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.2,
-                            stream: bool = False) -> Union[str, Dict[str, Any]]:
+                            stream: bool = False) -> Union[str, Iterator[str]]:
         """
         生成文本补全
 
@@ -49,68 +143,105 @@ class LLMInterface:
             stream (bool): 是否使用流式响应
 
         Returns:
-            Union[str, Dict[str, Any]]: 生成的文本或响应对象
+            Union[str, Iterator[str]]: 生成的文本；流式模式下为逐段返回文本的迭代器
         """
         try:
             endpoint = f"{self.api_url}/completions"
-
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                "stream": stream
-            }
+            payload = self._completion_payload(
+                prompt, max_tokens, temperature, stream)
 
             if stream:
-                response = requests.post(
-                    endpoint, json=payload, headers=self.headers, stream=True)
+                response = self.session.post(endpoint, json=payload, stream=True,
+                                             timeout=LLM_TIMEOUT)
                 response.raise_for_status()
-                return self._handle_stream_response(response)
+                return self._iter_stream(response)
             else:
-                response = requests.post(
-                    endpoint, json=payload, headers=self.headers)
+                response = self.session.post(endpoint, json=payload,
+                                             timeout=LLM_TIMEOUT)
                 response.raise_for_status()
-                response_json = response.json()
+                return self._parse_completion(_json_loads(response.content))
+
+        except Exception as e:
+            logger.error(f"调用LLM API时出错: {str(e)}")
+            return ""
+
+    def async_client(self):
+        """
+        创建异步HTTP客户端，可在多次异步调用间共用
+
+        Returns:
+            httpx.AsyncClient: 异步客户端
+
+        Raises:
+            ImportError: 未安装httpx
+        """
+        if httpx is None:
+            raise ImportError("异步接口需要安装 httpx")
+
+        connect_timeout, read_timeout = LLM_TIMEOUT
+        return httpx.AsyncClient(
+            headers=self.headers, http2=_HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout))
+
+    async def agenerate_completion(self, prompt: str, max_tokens: int = 2000,
+                                   temperature: float = 0.2, client=None) -> str:
+        """
+        异步生成文本补全
+
+        Args:
+            prompt (str): 提示文本
+            max_tokens (int): 最大生成令牌数
+            temperature (float): 温度参数，控制随机性
+            client (httpx.AsyncClient, optional): 共用的异步客户端
+
+        Returns:
+            str: 生成的文本
+        """
+        if httpx is None:
+            logger.error("未安装httpx，无法使用异步接口")
+            return ""
+
+        if client is None:
+            async with self.async_client() as client:
+                return await self.agenerate_completion(
+                    prompt, max_tokens, temperature, client)
+
+        try:
+            endpoint = f"{self.api_url}/completions"
+            payload = self._completion_payload(
+                prompt, max_tokens, temperature, False)
 
-                if "choices" in response_json and len(response_json["choices"]) > 0:
-                    return response_json["choices"][0]["text"].strip()
-                else:
-                    logger.error(f"API响应格式异常: {response_json}")
-                    return ""
+            response = await client.post(endpoint, json=payload)
+            response.raise_for_status()
+            return self._parse_completion(_json_loads(response.content))
 
         except Exception as e:
             logger.error(f"调用LLM API时出错: {str(e)}")
             return ""
 
-    def _handle_stream_response(self, response):
+    def _iter_stream(self, response):
         """
-        处理流式响应
+        逐段返回流式响应中的生成文本
 
         Args:
             response: 响应对象
 
         Returns:
-            str: 完整的生成文本
+            Iterator[str]: 生成文本片段
         """
-        full_response = ""
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    data = line[6:]  # 去掉 'data: ' 前缀
-                    if data == "[DONE]":
-                        break
-                    try:
-                        json_data = json.loads(data)
-                        if "choices" in json_data and len(json_data["choices"]) > 0:
-                            chunk = json_data["choices"][0].get("text", "")
-                            full_response += chunk
-                            yield chunk
-                    except json.JSONDecodeError:
-                        logger.error(f"解析流式响应时出错: {data}")
-
-        return full_response
+        try:
+            for data in iter_sse_data(response):
+                if data == b"[DONE]":
+                    break
+                try:
+                    json_data = _json_loads(data)
+                    if "choices" in json_data and len(json_data["choices"]) > 0:
+                        yield json_data["choices"][0].get("text", "")
+                except json.JSONDecodeError:
+                    logger.error(f"解析流式响应时出错: {data}")
+        finally:
+            # 调用方提前结束迭代时释放连接
+            response.close()
 
     def analyze_code(self, code: str, task_description: str) -> Dict[str, Any]:
         """
@@ -123,7 +254,37 @@ class LLMInterface:
         Returns:
             Dict[str, Any]: 分析结果
         """
-        prompt = f"""
+        response = self.generate_completion(
+            self._analyze_prompt(code, task_description))
+        return self._parse_analysis(response)
+
+    async def abatch_analyze(self, codes: List[str],
+                             task_description: str) -> List[Dict[str, Any]]:
+        """
+        并发分析多段代码
+
+        Args:
+            codes (List[str]): 要分析的代码列表
+            task_description (str): 任务描述
+
+        Returns:
+            List[Dict[str, Any]]: 各段代码的分析结果，顺序与 codes 一致
+        """
+        if httpx is None:
+            logger.error("未安装httpx，无法使用异步接口")
+            return [self._parse_analysis("") for _ in codes]
+
+        async with self.async_client() as client:
+            responses = await asyncio.gather(*[
+                self.agenerate_completion(
+                    self._analyze_prompt(code, task_description), client=client)
+                for code in codes
+            ])
+        return [self._parse_analysis(response) for response in responses]
+
+    def _analyze_prompt(self, code: str, task_description: str) -> str:
+        """构造代码分析提示词"""
+        return f"""
         请分析以下代码并根据任务描述提供修改建议:
         
         任务描述:
@@ -155,16 +316,16 @@ class LLMInterface:
         }}
         """
 
-        response = self.generate_completion(prompt)
+    def _parse_analysis(self, response: str) -> Dict[str, Any]:
+        """将代码分析响应解析为结果字典"""
+        response = _strip_fence(response)
+        result = _decode_typed(response, AnalyzeResult)
+        if result is not None:
+            return result
 
+        # 不符合结构定义时按普通JSON宽松解析
         try:
-            # 尝试解析为JSON
-            if response.startswith("```json"):
-                response = response.split("```json", 1)[1]
-            if response.endswith("```"):
-                response = response.rsplit("```", 1)[0]
-
-            return json.loads(response)
+            return _json_loads(response)
         except json.JSONDecodeError:
             logger.error("无法将响应解析为JSON")
             return {
@@ -208,27 +369,18 @@ class LLMInterface:
         }}
         """
 
-        response = self.generate_completion(prompt)
+        response = _strip_fence(self.generate_completion(prompt))
+        result = _decode_typed(response, GenerateResult)
+        if result is not None:
+            return result
 
         try:
-            # 尝试解析为JSON
-            if response.startswith("```json"):
-                response = response.split("```json", 1)[1]
-            if response.endswith("```"):
-                response = response.rsplit("```", 1)[0]
-
-            return json.loads(response)
+            # 不符合结构定义时按普通JSON宽松解析
+            return _json_loads(response)
         except json.JSONDecodeError:
             # 如果响应不是JSON格式，尝试提取代码部分
-            code = ""
-            if "```" in response:
-                code_blocks = response.split("```")
-                if len(code_blocks) > 1:
-                    # 去掉语言标识符
-                    code_content = code_blocks[1]
-                    if code_content.startswith(language):
-                        code_content = code_content[len(language):]
-                    code = code_content.strip()
+            match = _CODE_BLOCK_RE.search(response)
+            code = match.group(1).strip() if match else ""
 
             if not code:
                 code = response
@@ -241,6 +393,9 @@ class LLMInterface:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # 测试用例
     llm = LLMInterface()
 
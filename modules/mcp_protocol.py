@@ -6,21 +6,143 @@ from config import MCP_API_URL, MCP_API_KEY
 import json
 import sys
 import time
+import queue
+import asyncio
 import logging
+import threading
+import contextlib
 import requests
-from typing import Dict, List, Any, Optional, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from time import time as _now
+from typing import Dict, List, Any, Optional, Union, Tuple
+from modules._compat import _json_loads, _json_dumps, _HTTP2_AVAILABLE
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 # 添加项目根目录到路径
 sys.path.append('..')
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def _ts():
+    """当前Unix时间戳（秒，整数）"""
+    return int(_now())
+
+
+# 请求超时时间（连接, 读取），单位秒
+REQUEST_TIMEOUT = (3, 10)
+
+# 日志和状态后台上报参数
+LOG_BATCH_SIZE = 100
+LOG_FLUSH_INTERVAL = 0.5  # 秒
+SEND_RETRIES = 3
+SEND_RETRY_BACKOFF = 0.5  # 秒，每次重试翻倍
+
+# 通知后台线程立即发送已入队内容的标记
+_FLUSH = object()
+
+def _parse_response(response, action: str) -> Optional[Dict[str, Any]]:
+    """
+    检查响应状态码并解析响应体，同步与异步客户端共用
+
+    Args:
+        response: requests 或 httpx 的响应对象
+        action (str): 操作描述，用于日志
+
+    Returns:
+        Optional[Dict[str, Any]]: 解析后的响应（无响应体时为空字典），失败时为None
+    """
+    if response.status_code >= 400:
+        logger.error(
+            f"{action}失败: HTTP {response.status_code} - {response.text[:200]}")
+        return None
+
+    if not response.content:
+        return {}
+    try:
+        return _json_loads(response.content)
+    except ValueError as e:
+        logger.error(f"{action}响应解析失败: {str(e)}")
+        return None
+
+
+class LogBuffer:
+    """日志缓冲区，攒够一批或超过刷新间隔后通过批量接口一次上报"""
+
+    def __init__(self, client: "MCPClient", max_size: int = 50,
+                 flush_ms: int = 500):
+        """
+        初始化日志缓冲区
+
+        Args:
+            client (MCPClient): MCP客户端
+            max_size (int): 缓冲条数上限
+            flush_ms (int): 最早一条日志最多缓冲的毫秒数
+        """
+        self.client = client
+        self.max_size = max_size
+        self.flush_interval = flush_ms / 1000
+        self.entries: List[Dict[str, Any]] = []
+        self._first_at = 0.0
+
+    def add(self, message: str, level: str = "info", stage_id: str = None,
+            data: Dict[str, Any] = None) -> None:
+        """
+        添加一条日志，参数同 MCPClient.add_log
+
+        Args:
+            message (str): 日志消息
+            level (str): 日志级别
+            stage_id (str): 关联的阶段ID
+            data (Dict[str, Any]): 附加数据
+        """
+        now = time.monotonic()
+        if not self.entries:
+            self._first_at = now
+
+        entry = {
+            "message": message,
+            "level": level,
+            "timestamp": _ts()
+        }
+        if stage_id:
+            entry["stage_id"] = stage_id
+        if data:
+            entry["data"] = data
+        self.entries.append(entry)
+
+        if len(self.entries) >= self.max_size or \
+                now - self._first_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> bool:
+        """
+        上报缓冲的全部日志
+
+        Returns:
+            bool: 操作是否成功
+        """
+        if not self.entries:
+            return True
+        entries, self.entries = self.entries, []
+        return self.client.add_logs_batch(entries)
+
+
 class MCPClient:
     """MCP客户端，与MCP监控系统交互"""
 
+    # 会话状态缓存有效期（秒），过期后通过ETag条件请求重新验证
+    STATUS_CACHE_TTL = 1.0
+
+    # 各MCP服务（按 api_url 区分）不支持的可选接口，在进程内所有客户端间共享，
+    # 同一服务后续新建的客户端不再重复探测
+    _unsupported_endpoints: Dict[str, set] = {}
+
     def __init__(self, api_url=MCP_API_URL, api_key=MCP_API_KEY):
         """
         初始化MCP客户端
@@ -38,6 +160,229 @@ class MCPClient:
         self.session_id = None
         self.start_time = None
 
+        # 会话状态缓存：所属会话、ETag/Last-Modified、响应内容及获取时间
+        self._status_cache = {"session_id": None, "etag": None,
+                              "last_modified": None, "body": None, "ts": 0.0}
+
+        # 日志和状态更新放入队列，由后台线程批量上报，调用方无需等待
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._closed = False
+
+        # 一次部署的所有调用共用一个会话，保持长连接；安装了httpx和h2时
+        # 使用HTTP/2，后台线程与主线程的并发请求复用同一连接
+        self._http2 = httpx is not None and _HTTP2_AVAILABLE
+        if self._http2:
+            self.session = httpx.Client(
+                http2=True,
+                headers=self.headers,
+                timeout=httpx.Timeout(REQUEST_TIMEOUT[1],
+                                      connect=REQUEST_TIMEOUT[0]),
+                limits=httpx.Limits(max_connections=4)
+            )
+        else:
+            self.session = requests.Session()
+            self.session.headers.update(self.headers)
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=16,
+                max_retries=Retry(total=3, backoff_factor=0.2,
+                                  status_forcelist=[502, 503, 504])
+            )
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+    def close(self):
+        """上报剩余的日志和状态，停止后台线程并关闭底层HTTP会话"""
+        with self._worker_lock:
+            self._closed = True
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+        self.session.close()
+
+    def _send(self, method: str, endpoint: str, payload: Any = None,
+              headers: Dict[str, str] = None):
+        """
+        以预编码的JSON请求体发送请求
+
+        Args:
+            method (str): HTTP方法
+            endpoint (str): 请求URL
+            payload (Any, optional): 请求体
+            headers (Dict[str, str], optional): 额外的请求头
+
+        Returns:
+            requests.Response 或 httpx.Response: 响应对象
+        """
+        content = _json_dumps(payload) if payload is not None else None
+        if self._http2:
+            return self.session.request(method, endpoint, content=content,
+                                        headers=headers)
+        return self.session.request(method, endpoint, data=content,
+                                    headers=headers, timeout=REQUEST_TIMEOUT)
+
+    def _request(self, method: str, path: str, payload: Any = None,
+                 action: str = "调用MCP接口", require_session: bool = True,
+                 optional_endpoint: str = None) -> Optional[Dict[str, Any]]:
+        """
+        发送请求并解析响应，统一处理会话检查、状态码和异常
+
+        Args:
+            method (str): HTTP方法
+            path (str): 相对于 api_url 的路径
+            payload (Any, optional): 请求体
+            action (str): 操作描述，用于日志
+            require_session (bool): 是否要求已创建会话
+            optional_endpoint (str, optional): 可选接口名，服务端表明该接口
+                不存在时记录为不支持
+
+        Returns:
+            Optional[Dict[str, Any]]: 解析后的响应（无响应体时为空字典），失败时为None
+        """
+        if require_session and not self.session_id:
+            logger.error(f"未创建会话，无法{action}")
+            return None
+
+        try:
+            response = self._send(method, f"{self.api_url}{path}", payload)
+        except Exception as e:
+            logger.error(f"{action}时出错: {str(e)}")
+            return None
+
+        if optional_endpoint and self._endpoint_missing(response, require_session):
+            logger.warning(f"MCP服务不支持{action}接口")
+            self._unsupported_endpoints.setdefault(
+                self.api_url, set()).add(optional_endpoint)
+            return None
+
+        return _parse_response(response, action)
+
+    def _supports(self, endpoint: str) -> bool:
+        """当前MCP服务是否可能支持该可选接口（未探测到不支持）"""
+        return endpoint not in self._unsupported_endpoints.get(self.api_url, ())
+
+    def _endpoint_missing(self, response, session_scoped: bool) -> bool:
+        """
+        判断可选接口的错误响应是否表示接口本身不存在
+
+        405一定表示接口不存在；404只有在与具体资源无关时才算，会话相关接口的
+        404可能只是会话不存在，需确认会话仍可访问。
+
+        Args:
+            response: 响应对象
+            session_scoped (bool): 接口路径是否包含会话ID
+
+        Returns:
+            bool: 接口是否不存在
+        """
+        if response.status_code == 405:
+            return True
+        if response.status_code != 404:
+            return False
+        if not session_scoped:
+            return True
+        try:
+            check = self._send("GET", f"{self.api_url}/sessions/{self.session_id}")
+        except Exception:
+            return False
+        return check.status_code < 400
+
+    def _post(self, endpoint: str, payload: Any):
+        """以预编码的JSON请求体发送POST请求"""
+        return self._send("POST", endpoint, payload)
+
+    def flush(self):
+        """等待已入队的日志和状态全部上报完成"""
+        if self._worker is not None:
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def _enqueue(self, kind: str, payload: Dict[str, Any]) -> None:
+        """
+        将日志或状态更新放入后台上报队列，按需启动后台线程
+
+        Args:
+            kind (str): 上报类型 (log, status)
+            payload (Dict[str, Any]): 上报内容
+
+        Returns:
+            bool: 是否已放入队列，客户端关闭后返回False
+        """
+        with self._worker_lock:
+            if self._closed:
+                # 客户端已关闭，不再启动新的后台线程，只在本地记录
+                logger.warning(f"MCP客户端已关闭，未上报{kind}: {payload.get('message', '')}")
+                return False
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._drain, name="mcp-log-worker", daemon=True)
+                self._worker.start()
+            self._queue.put((kind, payload))
+        return True
+
+    def _drain(self):
+        """后台线程：攒够一批或超过刷新间隔后上报，收到None时退出"""
+        stopping = False
+        while not stopping:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+            while items[-1] is not None and items[-1] is not _FLUSH \
+                    and len(items) < LOG_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stopping = items[-1] is None
+            try:
+                self._send_queued(
+                    [item for item in items if item is not None and item is not _FLUSH])
+            except Exception as e:
+                logger.error(f"上报MCP日志时出错: {str(e)}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _send_queued(self, items: List[tuple]) -> None:
+        """按入队顺序上报，连续的日志合并为一次批量请求"""
+        logs = []
+        for kind, payload in items:
+            if kind == "log":
+                logs.append(payload)
+                continue
+            if logs:
+                self._with_retry(self._deliver_logs, logs)
+                logs = []
+            self._with_retry(
+                lambda p: None if self._post_status(p) else p, payload)
+        if logs:
+            self._with_retry(self._deliver_logs, logs)
+
+    def _with_retry(self, send, payload) -> bool:
+        """
+        失败时按指数退避重试
+
+        Args:
+            send: 发送函数，返回仍需重试的部分，为空表示全部成功
+            payload: 待发送的数据
+
+        Returns:
+            bool: 最终是否全部发送成功
+        """
+        for attempt in range(SEND_RETRIES):
+            payload = send(payload)
+            if not payload:
+                return True
+            if attempt < SEND_RETRIES - 1:
+                time.sleep(SEND_RETRY_BACKOFF * 2 ** attempt)
+        return False
+
     def create_session(self, project_name: str, pipeline_name: str,
                        description: str = "") -> str:
         """
@@ -51,38 +396,31 @@ class MCPClient:
         Returns:
             str: 会话ID
         """
-        try:
-            endpoint = f"{self.api_url}/sessions"
-
-            payload = {
-                "project_name": project_name,
-                "pipeline_name": pipeline_name,
-                "description": description,
-                "start_time": int(time.time())
-            }
-
-            response = requests.post(
-                endpoint, json=payload, headers=self.headers)
-            response.raise_for_status()
-            response_data = response.json()
+        payload = {
+            "project_name": project_name,
+            "pipeline_name": pipeline_name,
+            "description": description,
+            "start_time": _ts()
+        }
 
-            if "session_id" in response_data:
-                self.session_id = response_data["session_id"]
-                self.start_time = payload["start_time"]
-                logger.info(f"已创建MCP监控会话: {self.session_id}")
-                return self.session_id
-            else:
-                logger.error(f"创建会话响应异常: {response_data}")
-                return None
+        response_data = self._request("POST", "/sessions", payload,
+                                      "创建MCP监控会话", require_session=False)
+        if response_data is None:
+            return None
 
-        except Exception as e:
-            logger.error(f"创建MCP监控会话时出错: {str(e)}")
+        if "session_id" in response_data:
+            self.session_id = response_data["session_id"]
+            self.start_time = payload["start_time"]
+            logger.info(f"已创建MCP监控会话: {self.session_id}")
+            return self.session_id
+        else:
+            logger.error(f"创建会话响应异常: {response_data}")
             return None
 
     def update_status(self, status: str, message: str = "",
                       data: Dict[str, Any] = None) -> bool:
         """
-        更新会话状态
+        更新会话状态，放入队列由后台线程上报，立即返回
 
         Args:
             status (str): 状态码 (running, success, failed, warning)
@@ -96,28 +434,24 @@ class MCPClient:
             logger.error("未创建会话，无法更新状态")
             return False
 
-        try:
-            endpoint = f"{self.api_url}/sessions/{self.session_id}/status"
-
-            payload = {
-                "status": status,
-                "message": message,
-                "timestamp": int(time.time())
-            }
-
-            if data:
-                payload["data"] = data
+        payload = {
+            "status": status,
+            "message": message,
+            "timestamp": _ts()
+        }
 
-            response = requests.post(
-                endpoint, json=payload, headers=self.headers)
-            response.raise_for_status()
+        if data:
+            payload["data"] = data
 
-            logger.info(f"已更新会话状态: {status}")
-            return True
+        return self._enqueue("status", payload)
 
-        except Exception as e:
-            logger.error(f"更新会话状态时出错: {str(e)}")
+    def _post_status(self, payload: Dict[str, Any]) -> bool:
+        """同步上报会话状态"""
+        if self._request("POST", f"/sessions/{self.session_id}/status",
+                         payload, "更新会话状态") is None:
             return False
+        logger.info(f"已更新会话状态: {payload['status']}")
+        return True
 
     def add_stage(self, stage_name: str, status: str = "pending",
                   description: str = "") -> str:
@@ -132,35 +466,24 @@ class MCPClient:
         Returns:
             str: 阶段ID
         """
-        if not self.session_id:
-            logger.error("未创建会话，无法添加阶段")
-            return None
-
-        try:
-            endpoint = f"{self.api_url}/sessions/{self.session_id}/stages"
-
-            payload = {
-                "name": stage_name,
-                "status": status,
-                "description": description,
-                "start_time": int(time.time())
-            }
-
-            response = requests.post(
-                endpoint, json=payload, headers=self.headers)
-            response.raise_for_status()
-            response_data = response.json()
+        payload = {
+            "name": stage_name,
+            "status": status,
+            "description": description,
+            "start_time": _ts()
+        }
 
-            if "stage_id" in response_data:
-                stage_id = response_data["stage_id"]
-                logger.info(f"已添加部署阶段: {stage_name} (ID: {stage_id})")
-                return stage_id
-            else:
-                logger.error(f"添加阶段响应异常: {response_data}")
-                return None
+        response_data = self._request(
+            "POST", f"/sessions/{self.session_id}/stages", payload, "添加部署阶段")
+        if response_data is None:
+            return None
 
-        except Exception as e:
-            logger.error(f"添加部署阶段时出错: {str(e)}")
+        if "stage_id" in response_data:
+            stage_id = response_data["stage_id"]
+            logger.info(f"已添加部署阶段: {stage_name} (ID: {stage_id})")
+            return stage_id
+        else:
+            logger.error(f"添加阶段响应异常: {response_data}")
             return None
 
     def update_stage(self, stage_id: str, status: str,
@@ -177,45 +500,36 @@ class MCPClient:
         Returns:
             bool: 操作是否成功
         """
-        if not self.session_id:
-            logger.error("未创建会话，无法更新阶段")
-            return False
-
-        try:
-            endpoint = f"{self.api_url}/sessions/{self.session_id}/stages/{stage_id}"
-
-            payload = {
-                "status": status,
-                "message": message
-            }
-
-            if status in ["success", "failed"]:
-                payload["end_time"] = int(time.time())
-
-            if data:
-                payload["data"] = data
+        payload = {
+            "status": status,
+            "message": message
+        }
 
-            response = requests.put(
-                endpoint, json=payload, headers=self.headers)
-            response.raise_for_status()
+        if status in ["success", "failed"]:
+            payload["end_time"] = _ts()
 
-            logger.info(f"已更新阶段状态: {stage_id} -> {status}")
-            return True
+        if data:
+            payload["data"] = data
 
-        except Exception as e:
-            logger.error(f"更新阶段状态时出错: {str(e)}")
+        if self._request("PUT", f"/sessions/{self.session_id}/stages/{stage_id}",
+                         payload, "更新阶段状态") is None:
             return False
 
+        logger.info(f"已更新阶段状态: {stage_id} -> {status}")
+        return True
+
     def add_log(self, message: str, level: str = "info",
-                stage_id: str = None, data: Dict[str, Any] = None) -> bool:
+                stage_id: str = None, data: Dict[str, Any] = None,
+                timestamp: int = None) -> bool:
         """
-        添加日志
+        添加日志，放入队列由后台线程批量上报，立即返回
 
         Args:
             message (str): 日志消息
             level (str): 日志级别 (debug, info, warning, error)
             stage_id (str): 关联的阶段ID
             data (Dict[str, Any]): 附加数据
+            timestamp (int, optional): 日志时间戳，默认为当前时间
 
         Returns:
             bool: 操作是否成功
@@ -224,30 +538,187 @@ class MCPClient:
             logger.error("未创建会话，无法添加日志")
             return False
 
-        try:
-            endpoint = f"{self.api_url}/sessions/{self.session_id}/logs"
+        payload = {
+            "message": message,
+            "level": level,
+            "timestamp": timestamp or _ts()
+        }
 
-            payload = {
-                "message": message,
-                "level": level,
-                "timestamp": int(time.time())
+        if stage_id:
+            payload["stage_id"] = stage_id
+
+        if data:
+            payload["data"] = data
+
+        return self._enqueue("log", payload)
+
+    def _post_log(self, payload: Dict[str, Any]) -> bool:
+        """同步上报单条日志"""
+        return self._request("POST", f"/sessions/{self.session_id}/logs",
+                             payload, "添加日志") is not None
+
+    def add_logs_batch(self, entries: List[Dict[str, Any]]) -> bool:
+        """
+        批量添加日志，服务端不支持批量接口时逐条发送
+
+        Args:
+            entries (List[Dict[str, Any]]): 日志列表，每项包含 message、level、
+                timestamp，以及可选的 stage_id、data
+
+        Returns:
+            bool: 操作是否成功
+        """
+        return not self._deliver_logs(entries)
+
+    def _deliver_logs(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        发送一批日志，返回发送失败的日志，重试时只需重发这部分
+
+        Args:
+            entries (List[Dict[str, Any]]): 日志列表
+
+        Returns:
+            List[Dict[str, Any]]: 发送失败的日志，全部成功时为空列表
+        """
+        if not self.session_id:
+            logger.error("未创建会话，无法添加日志")
+            return entries
+
+        if not entries:
+            return []
+
+        if self._supports("logs_batch"):
+            if self._request("POST", f"/sessions/{self.session_id}/logs/batch",
+                             {"logs": entries}, "批量添加日志",
+                             optional_endpoint="logs_batch") is not None:
+                return []
+            if self._supports("logs_batch"):
+                return entries
+
+        # 逐条发送时只保留失败的日志，避免重试时重复上报已成功的部分
+        return [entry for entry in entries if not self._post_log(entry)]
+
+    def start_build(self, project_name: str, pipeline_name: str,
+                    description: str = "", initial_stage_name: str = "准备",
+                    initial_log: str = "构建参数",
+                    build_data: Dict[str, Any] = None) -> Optional[Tuple[str, str]]:
+        """
+        通过组合接口一次完成构建开始的全部记录
+
+        相当于依次调用 create_session、add_stage、add_log、update_stage 和
+        update_status("running")，是构建开始时的首选方式；细粒度方法仍用于
+        流程中的动态记录。
+
+        Args:
+            project_name (str): 项目名称
+            pipeline_name (str): 管道名称
+            description (str): 会话描述
+            initial_stage_name (str): 初始阶段名称
+            initial_log (str): 记录构建数据的日志消息
+            build_data (Dict[str, Any], optional): 构建数据
+
+        Returns:
+            Optional[Tuple[str, str]]: (会话ID, 阶段ID)，失败或服务端不支持
+                组合接口时为None
+        """
+        if not self._supports("builds_start"):
+            return None
+
+        now = _ts()
+        payload = {
+            "project_name": project_name,
+            "pipeline_name": pipeline_name,
+            "description": description,
+            "start_time": now,
+            "stage": {
+                "name": initial_stage_name,
+                "description": "初始化构建环境",
+                "status": "success",
+                "message": "环境准备完成"
+            },
+            "status": {
+                "status": "running",
+                "message": "构建已开始"
             }
+        }
 
-            if stage_id:
-                payload["stage_id"] = stage_id
+        if build_data:
+            payload["log"] = {
+                "message": initial_log,
+                "level": "info",
+                "data": build_data
+            }
 
-            if data:
-                payload["data"] = data
+        response_data = self._request(
+            "POST", "/builds/start", payload, "构建开始组合",
+            require_session=False, optional_endpoint="builds_start")
+        if response_data is None:
+            return None
 
-            response = requests.post(
-                endpoint, json=payload, headers=self.headers)
-            response.raise_for_status()
+        if "session_id" in response_data:
+            self.session_id = response_data["session_id"]
+            self.start_time = now
+            stage_id = response_data.get("stage_id")
+            logger.info(f"已创建MCP监控会话: {self.session_id} (阶段ID: {stage_id})")
+            return self.session_id, stage_id
+        else:
+            logger.error(f"构建开始组合接口响应异常: {response_data}")
+            return None
 
-            return True
+    @contextlib.contextmanager
+    def log_buffer(self, max_size: int = 50, flush_ms: int = 500):
+        """
+        在 with 块内缓冲日志，退出时上报剩余日志
 
-        except Exception as e:
-            logger.error(f"添加日志时出错: {str(e)}")
-            return False
+        Args:
+            max_size (int): 缓冲条数上限
+            flush_ms (int): 最早一条日志最多缓冲的毫秒数
+
+        Returns:
+            ContextManager[LogBuffer]: 日志缓冲区
+        """
+        buffer = LogBuffer(self, max_size, flush_ms)
+        try:
+            yield buffer
+        finally:
+            buffer.flush()
+
+    def batch(self, calls: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        在一次请求中执行多个相互依赖的调用
+
+        每个调用的格式为 {"id": 0, "op": "create_session", "payload": {...}}，
+        可通过 "input_from": {"session_id": 0} 引用前面调用的结果字段，
+        由服务端按依赖顺序执行，互不依赖的调用可并发执行。
+
+        Args:
+            calls (List[Dict[str, Any]]): 调用列表
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: 按调用顺序排列的结果，失败或服务端
+                不支持批量接口时为None
+        """
+        if not self._supports("batch"):
+            return None
+
+        response_data = self._request(
+            "POST", "/batch", {"calls": calls}, "批量调用",
+            require_session=False, optional_endpoint="batch")
+        if response_data is None:
+            return None
+
+        results = response_data.get("results")
+        if not isinstance(results, list) or len(results) != len(calls):
+            logger.error(f"批量调用响应异常: {results}")
+            return None
+
+        # 批量调用中创建的会话，后续调用可直接使用
+        for call, result in zip(calls, results):
+            if call["op"] == "create_session" and "session_id" in result:
+                self.session_id = result["session_id"]
+                self.start_time = call["payload"].get("start_time")
+
+        return results
 
     def close_session(self, status: str = "success",
                       summary: str = "") -> bool:
@@ -266,57 +737,330 @@ class MCPClient:
             return False
 
         try:
-            endpoint = f"{self.api_url}/sessions/{self.session_id}/close"
+            # 先上报队列中剩余的日志和状态
+            self.flush()
 
             payload = {
                 "status": status,
                 "summary": summary,
-                "end_time": int(time.time())
+                "end_time": _ts()
             }
 
             if self.start_time:
-                duration = payload["end_time"] - self.start_time
-                payload["duration"] = duration
+                payload["duration"] = payload["end_time"] - self.start_time
 
-            response = requests.post(
-                endpoint, json=payload, headers=self.headers)
-            response.raise_for_status()
+            if self._request("POST", f"/sessions/{self.session_id}/close",
+                             payload, "关闭监控会话") is None:
+                return False
 
             logger.info(f"已关闭监控会话: {self.session_id}")
             return True
 
-        except Exception as e:
-            logger.error(f"关闭监控会话时出错: {str(e)}")
-            return False
+        finally:
+            self.close()
 
     def get_session_status(self) -> Dict[str, Any]:
         """
         获取会话状态
 
+        短时间内重复调用直接返回缓存；缓存过期后携带 If-None-Match /
+        If-Modified-Since 重新验证，服务端返回304时沿用缓存内容。
+
         Returns:
             Dict[str, Any]: 会话状态信息
         """
         if not self.session_id:
-            logger.error("未创建会话，无法获取状态")
+            logger.error("未创建会话，无法获取会话状态")
             return None
 
-        try:
-            endpoint = f"{self.api_url}/sessions/{self.session_id}"
+        cache = self._status_cache
+        if cache["session_id"] != self.session_id:
+            cache.update(session_id=self.session_id, etag=None,
+                         last_modified=None, body=None, ts=0.0)
 
-            response = requests.get(endpoint, headers=self.headers)
-            response.raise_for_status()
+        now = time.monotonic()
+        if cache["body"] is not None and now - cache["ts"] < self.STATUS_CACHE_TTL:
+            return cache["body"]
 
-            return response.json()
+        headers = {}
+        if cache["body"] is not None:
+            if cache["etag"]:
+                headers["If-None-Match"] = cache["etag"]
+            if cache["last_modified"]:
+                headers["If-Modified-Since"] = cache["last_modified"]
 
+        try:
+            response = self._send("GET", f"{self.api_url}/sessions/{self.session_id}",
+                                  headers=headers or None)
         except Exception as e:
             logger.error(f"获取会话状态时出错: {str(e)}")
             return None
 
+        if response.status_code == 304 and cache["body"] is not None:
+            cache["ts"] = now
+            return cache["body"]
+
+        if response.status_code >= 400:
+            logger.error(
+                f"获取会话状态失败: HTTP {response.status_code} - {response.text[:200]}")
+            return None
+
+        try:
+            body = _json_loads(response.content)
+        except ValueError as e:
+            logger.error(f"获取会话状态响应解析失败: {str(e)}")
+            return None
+
+        cache.update(etag=response.headers.get("ETag"),
+                     last_modified=response.headers.get("Last-Modified"),
+                     body=body, ts=now)
+        return body
+
+
+class AsyncMCPClient:
+    """MCP异步客户端，接口与 MCPClient 相同，互不依赖的调用可并发执行"""
+
+    def __init__(self, api_url=MCP_API_URL, api_key=MCP_API_KEY):
+        """
+        初始化MCP异步客户端
+
+        Args:
+            api_url (str): MCP API地址
+            api_key (str): MCP API密钥
+
+        Raises:
+            ImportError: 未安装httpx
+        """
+        if httpx is None:
+            raise ImportError("AsyncMCPClient 需要安装 httpx")
+
+        self.api_url = api_url
+        self.api_key = api_key
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        self.session_id = None
+        self.start_time = None
+
+        self._client = httpx.AsyncClient(
+            base_url=api_url,
+            headers=self.headers,
+            http2=_HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(REQUEST_TIMEOUT[1],
+                                  connect=REQUEST_TIMEOUT[0]),
+            limits=httpx.Limits(max_keepalive_connections=8)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """关闭底层HTTP客户端"""
+        await self._client.aclose()
+
+    async def _request(self, method: str, path: str, payload: Any = None,
+                       action: str = "调用MCP接口",
+                       require_session: bool = True) -> Optional[Dict[str, Any]]:
+        """发送请求并解析响应，参数与返回值同 MCPClient._request"""
+        if require_session and not self.session_id:
+            logger.error(f"未创建会话，无法{action}")
+            return None
+
+        content = _json_dumps(payload) if payload is not None else None
+        try:
+            response = await self._client.request(method, path, content=content)
+        except Exception as e:
+            logger.error(f"{action}时出错: {str(e)}")
+            return None
+
+        return _parse_response(response, action)
+
+    async def create_session(self, project_name: str, pipeline_name: str,
+                             description: str = "") -> str:
+        """创建监控会话，参数与返回值同 MCPClient.create_session"""
+        payload = {
+            "project_name": project_name,
+            "pipeline_name": pipeline_name,
+            "description": description,
+            "start_time": _ts()
+        }
+
+        response_data = await self._request("POST", "/sessions", payload,
+                                            "创建MCP监控会话", require_session=False)
+        if response_data is None:
+            return None
+
+        if "session_id" in response_data:
+            self.session_id = response_data["session_id"]
+            self.start_time = payload["start_time"]
+            logger.info(f"已创建MCP监控会话: {self.session_id}")
+            return self.session_id
+        else:
+            logger.error(f"创建会话响应异常: {response_data}")
+            return None
+
+    async def update_status(self, status: str, message: str = "",
+                            data: Dict[str, Any] = None) -> bool:
+        """更新会话状态，参数与返回值同 MCPClient.update_status"""
+        payload = {
+            "status": status,
+            "message": message,
+            "timestamp": _ts()
+        }
+
+        if data:
+            payload["data"] = data
+
+        if await self._request("POST", f"/sessions/{self.session_id}/status",
+                               payload, "更新会话状态") is None:
+            return False
+
+        logger.info(f"已更新会话状态: {status}")
+        return True
+
+    async def add_stage(self, stage_name: str, status: str = "pending",
+                        description: str = "") -> str:
+        """添加部署阶段，参数与返回值同 MCPClient.add_stage"""
+        payload = {
+            "name": stage_name,
+            "status": status,
+            "description": description,
+            "start_time": _ts()
+        }
+
+        response_data = await self._request(
+            "POST", f"/sessions/{self.session_id}/stages", payload, "添加部署阶段")
+        if response_data is None:
+            return None
+
+        if "stage_id" in response_data:
+            stage_id = response_data["stage_id"]
+            logger.info(f"已添加部署阶段: {stage_name} (ID: {stage_id})")
+            return stage_id
+        else:
+            logger.error(f"添加阶段响应异常: {response_data}")
+            return None
+
+    async def update_stage(self, stage_id: str, status: str,
+                           message: str = "", data: Dict[str, Any] = None) -> bool:
+        """更新阶段状态，参数与返回值同 MCPClient.update_stage"""
+        payload = {
+            "status": status,
+            "message": message
+        }
+
+        if status in ["success", "failed"]:
+            payload["end_time"] = _ts()
+
+        if data:
+            payload["data"] = data
+
+        if await self._request(
+                "PUT", f"/sessions/{self.session_id}/stages/{stage_id}",
+                payload, "更新阶段状态") is None:
+            return False
+
+        logger.info(f"已更新阶段状态: {stage_id} -> {status}")
+        return True
+
+    async def add_log(self, message: str, level: str = "info",
+                      stage_id: str = None, data: Dict[str, Any] = None,
+                      timestamp: int = None) -> bool:
+        """添加日志，参数与返回值同 MCPClient.add_log"""
+        payload = {
+            "message": message,
+            "level": level,
+            "timestamp": timestamp or _ts()
+        }
+
+        if stage_id:
+            payload["stage_id"] = stage_id
+
+        if data:
+            payload["data"] = data
+
+        return await self._request("POST", f"/sessions/{self.session_id}/logs",
+                                   payload, "添加日志") is not None
+
+    async def close_session(self, status: str = "success",
+                            summary: str = "") -> bool:
+        """关闭监控会话，参数与返回值同 MCPClient.close_session"""
+        payload = {
+            "status": status,
+            "summary": summary,
+            "end_time": _ts()
+        }
+
+        if self.start_time:
+            payload["duration"] = payload["end_time"] - self.start_time
+
+        if await self._request("POST", f"/sessions/{self.session_id}/close",
+                               payload, "关闭监控会话") is None:
+            return False
+
+        logger.info(f"已关闭监控会话: {self.session_id}")
+        return True
+
+    async def get_session_status(self) -> Dict[str, Any]:
+        """获取会话状态，返回值同 MCPClient.get_session_status"""
+        return await self._request("GET", f"/sessions/{self.session_id}",
+                                   action="获取会话状态")
+
+async def anotify_build_start(project_name="", build_id="", data=None):
+    """
+    异步通知构建开始，阶段创建后其余调用并发执行
+
+    Args:
+        project_name (str): 项目名称
+        build_id (str): 构建ID
+        data (Dict[str, Any]): 构建数据
+
+    Returns:
+        bool: 操作是否成功
+    """
+    try:
+        async with AsyncMCPClient() as client:
+            session_id = await client.create_session(
+                project_name=project_name or "未命名项目",
+                pipeline_name=f"构建 #{build_id}" if build_id else "手动构建",
+                description=f"自动化部署流程 ({time.strftime('%Y-%m-%d %H:%M:%S')})"
+            )
+
+            if not session_id:
+                return False
+
+            # 添加准备阶段
+            stage_id = await client.add_stage(
+                "准备", status="running", description="初始化构建环境")
+
+            # 记录构建数据、更新阶段和会话状态互不依赖，并发执行
+            calls = [
+                client.update_stage(stage_id, "success", "环境准备完成"),
+                client.update_status("running", "构建已开始")
+            ]
+            if data:
+                calls.append(client.add_log(
+                    "构建参数", data=data, stage_id=stage_id))
+            await asyncio.gather(*calls)
+
+            return True
+
+    except Exception as e:
+        logger.error(f"通知构建开始时出错: {str(e)}")
+        return False
+
 
 def notify_build_start(project_name="", build_id="", data=None):
     """
     通知构建开始
 
+    优先使用组合接口 start_build 一次往返完成，服务端不支持时逐个同步调用。
+    需要在事件循环中并发执行时，请直接使用 anotify_build_start。
+
     Args:
         project_name (str): 项目名称
         build_id (str): 构建ID
@@ -325,8 +1069,20 @@ def notify_build_start(project_name="", build_id="", data=None):
     Returns:
         bool: 操作是否成功
     """
+    client = MCPClient()
     try:
-        client = MCPClient()
+        started = client.start_build(
+            project_name=project_name or "未命名项目",
+            pipeline_name=f"构建 #{build_id}" if build_id else "手动构建",
+            description=f"自动化部署流程 ({time.strftime('%Y-%m-%d %H:%M:%S')})",
+            build_data=data
+        )
+        if started is not None:
+            return True
+        if client._supports("builds_start"):
+            # 组合接口可用但调用失败，不再逐个重试，避免重复创建会话
+            return False
+
         session_id = client.create_session(
             project_name=project_name or "未命名项目",
             pipeline_name=f"构建 #{build_id}" if build_id else "手动构建",
@@ -356,8 +1112,15 @@ def notify_build_start(project_name="", build_id="", data=None):
         logger.error(f"通知构建开始时出错: {str(e)}")
         return False
 
+    finally:
+        # 上报队列中的日志和状态
+        client.close()
+
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # 测试用例
     client = MCPClient()
 
@@ -381,9 +1144,12 @@ if __name__ == "__main__":
         # 更新阶段状态
         client.update_stage(stage_id, "success", "代码检出完成")
 
-        # 添加新阶段
+        # 添加新阶段，编译过程的多条日志一次上报
         build_stage = client.add_stage("构建", status="running")
-        client.add_log("正在编译代码...", stage_id=build_stage)
+        with client.log_buffer() as logs:
+            logs.add("正在编译代码...", stage_id=build_stage)
+            for module in ["modules", "config", "main"]:
+                logs.add(f"编译 {module}", level="debug", stage_id=build_stage)
 
         # 模拟延迟
         time.sleep(2)
@@ -6,21 +6,101 @@ from config import NOTIFICATION
 import sys
 import json
 import time
+import asyncio
 import logging
+import atexit
 import smtplib
+import functools
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from string import Template
 from typing import Dict, List, Any, Optional, Union
+from modules._compat import _json_loads, _json_dumps
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 # 添加项目根目录到路径
 sys.path.append('..')
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# JSON请求头
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# 单个通知渠道的发送超时时间（秒）
+CHANNEL_TIMEOUT = 30
+
+# 各渠道并行发送共用的线程池，容纳多次通知同时发送
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="notification")
+
+# 各渠道的默认消息模板
+DEFAULT_SLACK_TEMPLATE = """
+:rocket: *部署通知*
+*项目*: ${project_name}
+*环境*: ${environment}
+*状态*: ${status}
+*版本*: ${version}
+*时间*: ${timestamp}
+${details}
+"""
+
+DEFAULT_WECOM_TEMPLATE = """
+【部署通知】
+项目：${project_name}
+环境：${environment}
+状态：${status}
+版本：${version}
+时间：${timestamp}
+${details}
+"""
+
+DEFAULT_EMAIL_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background-color: #f8f9fa; padding: 10px; border-bottom: 1px solid #ddd; }
+        .content { padding: 20px 0; }
+        .footer { color: #6c757d; font-size: 12px; margin-top: 30px; }
+        .success { color: #28a745; }
+        .failure { color: #dc3545; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h2>部署通知</h2>
+        </div>
+        <div class="content">
+            <p><strong>项目:</strong> ${project_name}</p>
+            <p><strong>环境:</strong> ${environment}</p>
+            <p><strong>状态:</strong> <span class="${status == 'success' ? 'success' : 'failure'}">${status}</span></p>
+            <p><strong>版本:</strong> ${version}</p>
+            <p><strong>时间:</strong> ${timestamp}</p>
+            ${details ? '<div><strong>详情:</strong><pre>' + details + '</pre></div>' : ''}
+        </div>
+        <div class="footer">
+            <p>此邮件由自动部署系统发送，请勿回复。</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+@functools.lru_cache(maxsize=16)
+def _get_template(template_str: str) -> Template:
+    """按模板字符串缓存编译后的Template，避免每次发送重复解析"""
+    return Template(template_str)
+
 
 class NotificationManager:
     """消息通知管理器"""
@@ -34,6 +114,62 @@ class NotificationManager:
         """
         self.config = config
 
+        # 默认渠道和渠道发送函数只计算一次
+        self._default_channels = tuple(
+            k for k, v in config.items() if isinstance(v, dict))
+        self._channel_funcs = {
+            "slack": self._send_slack,
+            "email": self._send_email,
+            "wecom": self._send_wecom
+        }
+
+        # 复用SMTP连接，避免每封邮件都重新握手、STARTTLS和登录
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+
+    def close(self):
+        """关闭复用的SMTP连接"""
+        with self._smtp_lock:
+            self._close_smtp()
+
+    def _close_smtp(self):
+        """关闭SMTP连接，需在持有 _smtp_lock 时调用"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _get_smtp(self, config: Dict[str, Any]) -> smtplib.SMTP:
+        """
+        获取可用的SMTP连接，连接断开时重新建立，需在持有 _smtp_lock 时调用
+
+        Args:
+            config (Dict[str, Any]): 邮件配置
+
+        Returns:
+            smtplib.SMTP: 已登录的SMTP连接
+        """
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_smtp()
+
+        server = smtplib.SMTP(config.get("smtp_server"), config.get("smtp_port", 587),
+                              timeout=CHANNEL_TIMEOUT)
+        try:
+            server.starttls()
+            server.login(config.get("username"), config.get("password"))
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        return server
+
     def send_notification(self, template_data: Dict[str, Any],
                           channels: List[str] = None) -> Dict[str, bool]:
         """
@@ -46,26 +182,22 @@ class NotificationManager:
         Returns:
             Dict[str, bool]: 各渠道发送结果
         """
+        # 未指定渠道时使用所有配置的渠道；显式传入空列表或没有可用渠道时直接返回
+        if channels is None:
+            channels = self._default_channels
         if not channels:
-            # 默认使用所有配置的渠道
-            channels = [k for k in self.config.keys(
-            ) if isinstance(self.config[k], dict)]
+            return {}
 
         results = {}
+        futures = {}
 
+        # 各渠道并行发送，避免被最慢的渠道阻塞
         for channel in channels:
             if channel in self.config:
-                channel_config = self.config[channel]
-
-                if channel == "slack":
-                    results[channel] = self._send_slack(
-                        channel_config, template_data)
-                elif channel == "email":
-                    results[channel] = self._send_email(
-                        channel_config, template_data)
-                elif channel == "wecom":
-                    results[channel] = self._send_wecom(
-                        channel_config, template_data)
+                sender = self._channel_funcs.get(channel)
+                if sender:
+                    futures[_executor.submit(
+                        sender, self.config[channel], template_data)] = channel
                 else:
                     logger.warning(f"未知的通知渠道: {channel}")
                     results[channel] = False
@@ -73,7 +205,99 @@ class NotificationManager:
                 logger.warning(f"未配置的通知渠道: {channel}")
                 results[channel] = False
 
-        return results
+        # 按完成顺序收集结果，超时未完成的渠道记为失败
+        try:
+            for future in as_completed(futures, timeout=CHANNEL_TIMEOUT):
+                results[futures[future]] = future.result()
+        except TimeoutError:
+            for future, channel in futures.items():
+                if not future.done():
+                    logger.error(f"通知渠道 {channel} 发送超时")
+                    results[channel] = False
+
+        # 保持与请求渠道一致的顺序
+        return {channel: results[channel] for channel in channels}
+
+    async def asend_notification(self, template_data: Dict[str, Any],
+                                 channels: List[str] = None) -> Dict[str, bool]:
+        """
+        异步发送通知到多个渠道，各渠道通过 asyncio.gather 并发发送
+
+        Webhook渠道共用一个 httpx.AsyncClient，邮件在线程中发送。
+
+        Args:
+            template_data (Dict[str, Any]): 模板数据
+            channels (List[str], optional): 通知渠道列表
+
+        Returns:
+            Dict[str, bool]: 各渠道发送结果
+        """
+        if httpx is None:
+            logger.warning("未安装httpx，改为在线程池中发送通知")
+            return await asyncio.to_thread(
+                self.send_notification, template_data, channels)
+
+        # 未指定渠道时使用所有配置的渠道；显式传入空列表或没有可用渠道时直接返回
+        if channels is None:
+            channels = self._default_channels
+        if not channels:
+            return {}
+
+        results = {}
+
+        async with httpx.AsyncClient(timeout=CHANNEL_TIMEOUT) as client:
+            senders = {
+                "slack": lambda cfg: self._send_slack_async(client, cfg, template_data),
+                "wecom": lambda cfg: self._send_wecom_async(client, cfg, template_data),
+                "email": lambda cfg: asyncio.to_thread(
+                    self._send_email, cfg, template_data)
+            }
+
+            tasks = {}
+            for channel in channels:
+                if channel in self.config:
+                    sender = senders.get(channel)
+                    if sender:
+                        tasks[channel] = sender(self.config[channel])
+                    else:
+                        logger.warning(f"未知的通知渠道: {channel}")
+                        results[channel] = False
+                else:
+                    logger.warning(f"未配置的通知渠道: {channel}")
+                    results[channel] = False
+
+            outcomes = await asyncio.gather(*tasks.values(),
+                                            return_exceptions=True)
+
+        for channel, outcome in zip(tasks, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"通知渠道 {channel} 发送出错: {str(outcome)}")
+                results[channel] = False
+            else:
+                results[channel] = outcome
+
+        # 保持与请求渠道一致的顺序
+        return {channel: results[channel] for channel in channels}
+
+    def _slack_payload(self, config: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+        """按模板生成Slack消息体"""
+        # 填充模板
+        template = _get_template(config.get("template") or DEFAULT_SLACK_TEMPLATE)
+        message = template.safe_substitute(data)
+
+        return {
+            "text": message
+        }
+
+    def _check_slack_response(self, response) -> bool:
+        """检查Slack Webhook的响应（requests与httpx的响应对象均可）"""
+        if response.status_code in [200, 201]:
+            logger.info("Slack通知发送成功")
+            return True
+        else:
+            logger.error(
+                f"Slack通知发送失败: {response.status_code} - {response.text}")
+            return False
 
     def _send_slack(self, config: Dict[str, Any], data: Dict[str, Any]) -> bool:
         """
@@ -92,43 +316,45 @@ class NotificationManager:
                 logger.error("未配置Slack Webhook URL")
                 return False
 
-            # 获取模板
-            template_str = config.get("template", "")
-            if not template_str:
-                # 默认模板
-                template_str = """
-                :rocket: *部署通知*
-                *项目*: ${project_name}
-                *环境*: ${environment}
-                *状态*: ${status}
-                *版本*: ${version}
-                *时间*: ${timestamp}
-                ${details}
-                """
-
-            # 填充模板
-            template = Template(template_str)
-            message = template.safe_substitute(data)
-
             # 发送请求
-            payload = {
-                "text": message
-            }
-
             response = requests.post(
                 webhook_url,
-                json=payload,
-                headers={"Content-Type": "application/json"}
+                data=_json_dumps(self._slack_payload(config, data)),
+                headers=_JSON_HEADERS,
+                timeout=CHANNEL_TIMEOUT
             )
 
-            if response.status_code in [200, 201]:
-                logger.info("Slack通知发送成功")
-                return True
-            else:
-                logger.error(
-                    f"Slack通知发送失败: {response.status_code} - {response.text}")
+            return self._check_slack_response(response)
+
+        except Exception as e:
+            logger.error(f"发送Slack通知时出错: {str(e)}")
+            return False
+
+    async def _send_slack_async(self, client, config: Dict[str, Any],
+                                data: Dict[str, Any]) -> bool:
+        """
+        异步发送Slack通知
+
+        Args:
+            client (httpx.AsyncClient): 异步HTTP客户端
+            config (Dict[str, Any]): Slack配置
+            data (Dict[str, Any]): 模板数据
+
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            webhook_url = config.get("webhook")
+            if not webhook_url:
+                logger.error("未配置Slack Webhook URL")
                 return False
 
+            response = await client.post(
+                webhook_url, content=_json_dumps(self._slack_payload(config, data)),
+                headers=_JSON_HEADERS)
+
+            return self._check_slack_response(response)
+
         except Exception as e:
             logger.error(f"发送Slack通知时出错: {str(e)}")
             return False
@@ -146,7 +372,6 @@ class NotificationManager:
         """
         try:
             smtp_server = config.get("smtp_server")
-            smtp_port = config.get("smtp_port", 587)
             username = config.get("username")
             password = config.get("password")
 
@@ -163,50 +388,11 @@ class NotificationManager:
 
             # 获取邮件主题
             subject_template = config.get("subject", "部署通知 - ${project_name}")
-            subject = Template(subject_template).safe_substitute(data)
-
-            # 获取邮件正文模板
-            body_template_str = config.get("template", "")
-            if not body_template_str:
-                # 默认HTML模板
-                body_template_str = """
-                <!DOCTYPE html>
-                <html>
-                <head>
-                    <style>
-                        body { font-family: Arial, sans-serif; }
-                        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                        .header { background-color: #f8f9fa; padding: 10px; border-bottom: 1px solid #ddd; }
-                        .content { padding: 20px 0; }
-                        .footer { color: #6c757d; font-size: 12px; margin-top: 30px; }
-                        .success { color: #28a745; }
-                        .failure { color: #dc3545; }
-                    </style>
-                </head>
-                <body>
-                    <div class="container">
-                        <div class="header">
-                            <h2>部署通知</h2>
-                        </div>
-                        <div class="content">
-                            <p><strong>项目:</strong> ${project_name}</p>
-                            <p><strong>环境:</strong> ${environment}</p>
-                            <p><strong>状态:</strong> <span class="${status == 'success' ? 'success' : 'failure'}">${status}</span></p>
-                            <p><strong>版本:</strong> ${version}</p>
-                            <p><strong>时间:</strong> ${timestamp}</p>
-                            ${details ? '<div><strong>详情:</strong><pre>' + details + '</pre></div>' : ''}
-                        </div>
-                        <div class="footer">
-                            <p>此邮件由自动部署系统发送，请勿回复。</p>
-                        </div>
-                    </div>
-                </body>
-                </html>
-                """
-
-            # 填充模板
-            body_template = Template(body_template_str)
-            body = body_template.safe_substitute(data)
+            subject = _get_template(subject_template).safe_substitute(data)
+
+            # 填充邮件正文模板
+            body = _get_template(
+                config.get("template") or DEFAULT_EMAIL_TEMPLATE).safe_substitute(data)
 
             # 创建邮件
             msg = MIMEMultipart()
@@ -217,11 +403,14 @@ class NotificationManager:
             # 添加正文
             msg.attach(MIMEText(body, "html"))
 
-            # 发送邮件
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(username, password)
-                server.sendmail(username, recipients, msg.as_string())
+            # 发送邮件，复用已登录的连接，服务端断开时重连一次
+            message = msg.as_string()
+            with self._smtp_lock:
+                try:
+                    self._get_smtp(config).sendmail(username, recipients, message)
+                except smtplib.SMTPServerDisconnected:
+                    self._close_smtp()
+                    self._get_smtp(config).sendmail(username, recipients, message)
 
             logger.info(f"邮件已发送至: {', '.join(recipients)}")
             return True
@@ -247,55 +436,77 @@ class NotificationManager:
                 logger.error("未配置企业微信Webhook URL")
                 return False
 
-            # 获取模板
-            template_str = config.get("template", "")
-            if not template_str:
-                # 默认模板
-                template_str = """
-                【部署通知】
-                项目：${project_name}
-                环境：${environment}
-                状态：${status}
-                版本：${version}
-                时间：${timestamp}
-                ${details}
-                """
-
-            # 填充模板
-            template = Template(template_str)
-            message = template.safe_substitute(data)
-
             # 发送请求
-            payload = {
-                "msgtype": "text",
-                "text": {
-                    "content": message
-                }
-            }
-
             response = requests.post(
                 webhook_url,
-                json=payload,
-                headers={"Content-Type": "application/json"}
+                data=_json_dumps(self._wecom_payload(config, data)),
+                headers=_JSON_HEADERS,
+                timeout=CHANNEL_TIMEOUT
             )
 
-            if response.status_code in [200, 201]:
-                response_data = response.json()
-                if response_data.get("errcode") == 0:
-                    logger.info("企业微信通知发送成功")
-                    return True
-                else:
-                    logger.error(f"企业微信通知发送失败: {response_data.get('errmsg')}")
-                    return False
-            else:
-                logger.error(
-                    f"企业微信通知发送失败: {response.status_code} - {response.text}")
+            return self._check_wecom_response(response)
+
+        except Exception as e:
+            logger.error(f"发送企业微信通知时出错: {str(e)}")
+            return False
+
+    async def _send_wecom_async(self, client, config: Dict[str, Any],
+                                data: Dict[str, Any]) -> bool:
+        """
+        异步发送企业微信通知
+
+        Args:
+            client (httpx.AsyncClient): 异步HTTP客户端
+            config (Dict[str, Any]): 企业微信配置
+            data (Dict[str, Any]): 模板数据
+
+        Returns:
+            bool: 操作是否成功
+        """
+        try:
+            webhook_url = config.get("webhook")
+            if not webhook_url:
+                logger.error("未配置企业微信Webhook URL")
                 return False
 
+            response = await client.post(
+                webhook_url, content=_json_dumps(self._wecom_payload(config, data)),
+                headers=_JSON_HEADERS)
+
+            return self._check_wecom_response(response)
+
         except Exception as e:
             logger.error(f"发送企业微信通知时出错: {str(e)}")
             return False
 
+    def _wecom_payload(self, config: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+        """按模板生成企业微信消息体"""
+        # 填充模板
+        template = _get_template(config.get("template") or DEFAULT_WECOM_TEMPLATE)
+        message = template.safe_substitute(data)
+
+        return {
+            "msgtype": "text",
+            "text": {
+                "content": message
+            }
+        }
+
+    def _check_wecom_response(self, response) -> bool:
+        """检查企业微信Webhook的响应（requests与httpx的响应对象均可）"""
+        if response.status_code in [200, 201]:
+            response_data = _json_loads(response.content)
+            if response_data.get("errcode") == 0:
+                logger.info("企业微信通知发送成功")
+                return True
+            else:
+                logger.error(f"企业微信通知发送失败: {response_data.get('errmsg')}")
+                return False
+        else:
+            logger.error(
+                f"企业微信通知发送失败: {response.status_code} - {response.text}")
+            return False
+
 
 def send_deployment_notification(project_name, environment, status, version=None,
                                  details=None, channels=None):
@@ -324,11 +535,28 @@ def send_deployment_notification(project_name, environment, status, version=None
     }
 
     # 发送通知
-    manager = NotificationManager()
-    return manager.send_notification(template_data, channels)
+    return _get_manager().send_notification(template_data, channels)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def _get_manager():
+    """获取共享的NotificationManager实例，复用其SMTP连接"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = NotificationManager()
+                atexit.register(_manager.close)
+    return _manager
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
     # 测试用例
     template_data = {
         "project_name": "测试项目",
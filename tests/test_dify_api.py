@@ -0,0 +1,101 @@
+"""
+Dify API模块测试
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from modules import dify_api
+
+
+class DecodeStreamTest(unittest.TestCase):
+    """流式响应的JSON解析"""
+
+    def test_json_split_across_chunks(self):
+        chunks = ['{"files_to_modify": ["a.py"], ', '"git_strategy": "}"', "}\n"]
+        parsed, text = dify_api._decode_stream(iter(chunks))
+        self.assertEqual(parsed, {"files_to_modify": ["a.py"], "git_strategy": "}"})
+        self.assertEqual(text, "".join(chunks))
+
+    def test_trailing_text_is_rejected(self):
+        chunks = ['{"a": 1}', " 以上是修改方案"]
+        parsed, text = dify_api._decode_stream(iter(chunks))
+        self.assertIsNone(parsed)
+        self.assertEqual(text, '{"a": 1} 以上是修改方案')
+
+    def test_non_json_answer(self):
+        parsed, text = dify_api._decode_stream(iter(["无法生成方案"]))
+        self.assertIsNone(parsed)
+        self.assertEqual(text, "无法生成方案")
+
+
+class FakeDifyClient:
+    """记录调用次数，按顺序返回预置回答的桩客户端"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def generate(self, prompt, conversation_id=None, stream=False):
+        self.calls += 1
+        return iter([self.answers.pop(0)])
+
+
+class RequirementCacheTest(unittest.TestCase):
+    """需求解析结果的磁盘缓存"""
+
+    DOC = "需求：增加验证码"
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        patcher = mock.patch.object(dify_api, "DIFY_CACHE_DIR", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _analyze(self, client, **kwargs):
+        with mock.patch.object(dify_api, "_get_client", return_value=client):
+            return dify_api.analyze_requirements(self.DOC, **kwargs)
+
+    def test_second_call_hits_cache(self):
+        client = FakeDifyClient('{"v": 1}', '{"v": 2}')
+        self.assertEqual(self._analyze(client), {"v": 1})
+        self.assertEqual(self._analyze(client), {"v": 1})
+        self.assertEqual(client.calls, 1)
+
+    def test_force_refresh_bypasses_and_updates_cache(self):
+        client = FakeDifyClient('{"v": 1}', '{"v": 2}')
+        self._analyze(client)
+        self.assertEqual(self._analyze(client, force_refresh=True), {"v": 2})
+        self.assertEqual(self._analyze(client), {"v": 2})
+        self.assertEqual(client.calls, 2)
+
+    def test_expired_entry_is_ignored(self):
+        client = FakeDifyClient('{"v": 1}', '{"v": 2}')
+        self._analyze(client)
+        path = dify_api._cache_path(self.DOC)
+        expired = time.time() - dify_api.DIFY_CACHE_TTL - 1
+        os.utime(path, (expired, expired))
+        self.assertEqual(self._analyze(client), {"v": 2})
+        self.assertEqual(client.calls, 2)
+
+    def test_unparsed_answer_is_not_cached(self):
+        client = FakeDifyClient("不是JSON", '{"v": 1}')
+        self.assertEqual(self._analyze(client), {"raw_response": "不是JSON"})
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_failed_write_keeps_previous_entry(self):
+        dify_api._save_cached_result(self.DOC, {"v": 1})
+        # 写到一半失败时既不留下临时文件，也不破坏已有缓存
+        dify_api._save_cached_result(self.DOC, {"v": object()})
+        self.assertEqual(os.listdir(self.cache_dir),
+                         [os.path.basename(dify_api._cache_path(self.DOC))])
+        self.assertEqual(dify_api._load_cached_result(self.DOC), {"v": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Jenkins操作模块测试，使用内存中的桩会话代替Jenkins服务
+"""
+
+import json
+import unittest
+from unittest import mock
+
+from modules import jenkins_ops
+from modules.jenkins_ops import JenkinsClient
+
+
+class FakeResponse:
+    """最小化的响应对象，提供客户端用到的属性和方法"""
+
+    def __init__(self, status_code=200, body=b"", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode()
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise jenkins_ops.requests.HTTPError(self.status_code)
+
+    def iter_content(self, chunk_size=None):
+        for i in range(0, len(self.content), chunk_size or len(self.content) or 1):
+            yield self.content[i:i + chunk_size]
+
+
+class FakeSession:
+    """按预置响应队列依次应答，并记录每次请求"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def _next(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return self.responses.pop(0)
+
+    def get(self, url, **kwargs):
+        return self._next("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._next("POST", url, **kwargs)
+
+    def close(self):
+        pass
+
+
+def make_client(*responses):
+    client = JenkinsClient(url="http://jenkins.test/")
+    client.session.close()
+    client.session = FakeSession(responses)
+    return client
+
+
+class BuildInfoETagTest(unittest.TestCase):
+    """构建信息的条件请求"""
+
+    def test_304_returns_previous_info(self):
+        info = {"result": None, "building": True}
+        client = make_client(FakeResponse(200, info, {"ETag": '"e1"'}),
+                             FakeResponse(304))
+
+        self.assertEqual(client.get_build_info("job", 3), info)
+        self.assertEqual(client.get_build_info("job", 3), info)
+
+        first, second = client.session.calls
+        self.assertNotIn("If-None-Match", first[2]["headers"])
+        self.assertEqual(second[2]["headers"]["If-None-Match"], '"e1"')
+
+    def test_etag_is_scoped_by_tree(self):
+        client = make_client(FakeResponse(200, {"a": 1}, {"ETag": '"e1"'}),
+                             FakeResponse(200, {"b": 2}, {"ETag": '"e2"'}))
+        client.get_build_info("job", 3)
+        self.assertEqual(client.get_build_info("job", 3, tree="b"), {"b": 2})
+        self.assertNotIn("If-None-Match", client.session.calls[1][2]["headers"])
+
+
+class CrumbRetryTest(unittest.TestCase):
+    """CSRF crumb的延迟获取与失效重试"""
+
+    @staticmethod
+    def _crumb(value):
+        return FakeResponse(200, {"crumbRequestField": "Jenkins-Crumb", "crumb": value})
+
+    def test_crumb_fetched_once_for_several_posts(self):
+        client = make_client(self._crumb("c1"), FakeResponse(200), FakeResponse(200))
+        self.assertTrue(client.abort_build("job", 1))
+        self.assertTrue(client.abort_build("job", 2))
+
+        methods = [method for method, url, kwargs in client.session.calls]
+        self.assertEqual(methods, ["GET", "POST", "POST"])
+
+    def test_stale_crumb_is_refreshed_and_post_retried(self):
+        client = make_client(self._crumb("c1"),
+                             FakeResponse(403, b"No valid crumb was included in the request"),
+                             self._crumb("c2"),
+                             FakeResponse(200))
+        self.assertTrue(client.abort_build("job", 1))
+
+        posts = [kwargs["headers"]["Jenkins-Crumb"]
+                 for method, url, kwargs in client.session.calls if method == "POST"]
+        self.assertEqual(posts, ["c1", "c2"])
+
+    def test_other_403_is_not_retried(self):
+        client = make_client(self._crumb("c1"), FakeResponse(403, b"Forbidden"))
+        self.assertFalse(client.abort_build("job", 1))
+        self.assertEqual(len(client.session.calls), 2)
+
+
+class BuildLogTest(unittest.TestCase):
+    """构建日志的分块与偏移"""
+
+    def test_follow_continues_from_text_size(self):
+        client = make_client(
+            FakeResponse(200, b"line1\n", {"X-Text-Size": "6", "X-More-Data": "true"}),
+            FakeResponse(200, b"line2\n", {"X-Text-Size": "12"}))
+
+        with mock.patch.object(jenkins_ops.time, "sleep"):
+            log = b"".join(client.iter_build_log("job", 5, chunk_size=4, follow=True))
+
+        self.assertEqual(log, b"line1\nline2\n")
+        starts = [kwargs["params"]["start"] for method, url, kwargs in client.session.calls]
+        self.assertEqual(starts, [0, 6])
+
+    def test_without_follow_reads_once_from_start(self):
+        client = make_client(
+            FakeResponse(200, b"tail", {"X-Text-Size": "104", "X-More-Data": "true"}))
+        self.assertEqual(list(client.iter_build_log("job", 5, start=100)), [b"tail"])
+        self.assertEqual(client.session.calls[0][2]["params"], {"start": 100})
+
+    def test_get_build_log_decodes_chunks(self):
+        client = make_client(FakeResponse(200, "构建成功\n".encode()))
+        self.assertEqual(client.get_build_log("job", 5), "构建成功\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+大模型接口模块测试
+"""
+
+import unittest
+from unittest import mock
+
+from modules import llm_interface
+from modules.llm_interface import LLMInterface
+
+
+class StripFenceTest(unittest.TestCase):
+    """代码围栏的去除"""
+
+    BODY = '{"analysis": "ok", "changes": [], "diff": ""}'
+
+    def test_multiline_fence(self):
+        text = f"```json\n{self.BODY}\n```"
+        self.assertEqual(llm_interface._strip_fence(text).strip(), self.BODY)
+
+    def test_single_line_fence(self):
+        text = f"```json {self.BODY}```"
+        self.assertEqual(llm_interface._strip_fence(text).strip(), self.BODY)
+
+    def test_fence_without_language(self):
+        self.assertEqual(llm_interface._strip_fence(f"```{self.BODY}```"), self.BODY)
+
+    def test_unfenced_text_unchanged(self):
+        self.assertEqual(llm_interface._strip_fence(self.BODY), self.BODY)
+
+    def test_parse_analysis_accepts_both_shapes(self):
+        llm = LLMInterface()
+        self.addCleanup(llm.session.close)
+        for text in (f"```json\n{self.BODY}\n```", f"```json {self.BODY}```"):
+            with self.subTest(text=text):
+                self.assertEqual(llm._parse_analysis(text)["analysis"], "ok")
+
+    def test_code_block_on_single_line(self):
+        match = llm_interface._CODE_BLOCK_RE.search("说明 ```python print(1)``` 结束")
+        self.assertEqual(match.group(1), "print(1)")
+
+
+class ClientSetupTest(unittest.TestCase):
+    """HTTP客户端的创建"""
+
+    def test_http_and_https_share_enlarged_pool(self):
+        llm = LLMInterface(api_url="http://llm-gateway.internal/v1")
+        self.addCleanup(llm.session.close)
+        for url in ("http://llm-gateway.internal/v1", "https://api.example.com"):
+            self.assertEqual(llm.session.get_adapter(url)._pool_maxsize, 16)
+
+    def test_async_client_without_httpx(self):
+        llm = LLMInterface()
+        self.addCleanup(llm.session.close)
+        with mock.patch.object(llm_interface, "httpx", None):
+            with self.assertRaises(ImportError):
+                llm.async_client()
+
+
+if __name__ == "__main__":
+    unittest.main()
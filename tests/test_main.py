@@ -0,0 +1,69 @@
+"""
+主流程测试
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import importlib
+import threading
+import unittest
+from unittest import mock
+
+
+class RunCleanupTest(unittest.TestCase):
+    """流程提前失败时对后台任务的处理"""
+
+    @classmethod
+    def setUpClass(cls):
+        # main 在导入时于当前目录创建日志文件，导入时切换到临时目录
+        cls.tmp = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        os.chdir(cls.tmp)
+        try:
+            cls.main = importlib.import_module("main")
+        finally:
+            os.chdir(cwd)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_running_clone_is_awaited_and_cleaned_up(self):
+        deployer = self.main.AutoDeployment("demo", "/nonexistent/repo.git",
+                                            mcp_monitor=False)
+        work_dir = deployer.git.work_dir
+        started = threading.Event()
+        finished = []
+
+        def slow_clone():
+            started.set()
+            time.sleep(0.3)
+            finished.append(True)
+            return True
+
+        def failing_analysis(doc_text):
+            # 确保分析失败时克隆已在执行，而不是还在队列中被直接取消
+            started.wait(5)
+            return {"error": "bad document"}
+
+        deployer.git.clone = slow_clone
+        with mock.patch.object(self.main, "analyze_requirements", failing_analysis):
+            result = deployer.run("doc")
+
+        self.assertFalse(result["success"])
+        self.assertEqual(result["stage"], "需求解析")
+        # run 返回前已等待克隆结束，并把工作目录交给清理线程
+        self.assertEqual(finished, [True])
+        self.assertIsNone(deployer._clone_future)
+        self.assertFalse(deployer.git.is_temp_dir)
+        for _ in range(50):
+            if not os.path.exists(work_dir):
+                break
+            time.sleep(0.02)
+        self.assertFalse(os.path.exists(work_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
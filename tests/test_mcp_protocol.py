@@ -0,0 +1,197 @@
+"""
+MCP协议模块测试，使用内存中的桩会话代替HTTP服务
+"""
+
+import json
+import threading
+import unittest
+from unittest import mock
+
+from modules import mcp_protocol
+from modules.mcp_protocol import MCPClient
+
+
+class FakeResponse:
+    """最小化的响应对象，提供客户端用到的属性"""
+
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode() if body is not None else b""
+        self.text = self.content.decode()
+        self.headers = {}
+
+
+class FakeSession:
+    """记录请求并按路由函数返回响应的桩会话"""
+
+    def __init__(self, route):
+        self.route = route
+        self.calls = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def request(self, method, url, data=None, content=None, headers=None, timeout=None):
+        body = data if data is not None else content
+        payload = json.loads(body) if body else None
+        path = url.split("://", 1)[1].split("/", 1)[1]
+        with self._lock:
+            self.calls.append((method, "/" + path, payload))
+        return self.route(method, "/" + path, payload)
+
+    def close(self):
+        self.closed = True
+
+
+def make_client(route, api_url="http://mcp.test"):
+    """创建使用桩会话的客户端，会话ID已就绪"""
+    client = MCPClient(api_url=api_url)
+    client.session.close()
+    client.session = FakeSession(route)
+    client._http2 = False
+    client.session_id = "s1"
+    return client
+
+
+class EndpointProbeTest(unittest.TestCase):
+    """可选接口的探测与缓存"""
+
+    def setUp(self):
+        MCPClient._unsupported_endpoints.clear()
+        self.addCleanup(MCPClient._unsupported_endpoints.clear)
+
+    def test_missing_route_is_cached_per_api_url(self):
+        client = make_client(lambda m, p, b: FakeResponse(404))
+        self.assertIsNone(client.batch([{"op": "create_session", "payload": {}}]))
+        self.assertFalse(client._supports("batch"))
+
+        # 同一服务的新客户端不再探测，其他服务不受影响
+        self.assertFalse(make_client(None)._supports("batch"))
+        self.assertTrue(make_client(None, api_url="http://other.test")._supports("batch"))
+
+    def test_405_marks_session_endpoint_unsupported(self):
+        client = make_client(lambda m, p, b: FakeResponse(405))
+        self.assertFalse(client.add_logs_batch([{"message": "a"}]))
+        self.assertFalse(client._supports("logs_batch"))
+
+    def test_404_for_missing_session_is_not_unsupported(self):
+        # 会话不存在时所有会话相关路径都返回404
+        client = make_client(lambda m, p, b: FakeResponse(404))
+        self.assertFalse(client.add_logs_batch([{"message": "a"}]))
+        self.assertTrue(client._supports("logs_batch"))
+
+    def test_404_with_live_session_falls_back_to_single_logs(self):
+        def route(method, path, body):
+            if path.endswith("/logs/batch"):
+                return FakeResponse(404)
+            return FakeResponse(200, {})
+        client = make_client(route)
+        self.assertTrue(client.add_logs_batch([{"message": "a"}, {"message": "b"}]))
+        self.assertFalse(client._supports("logs_batch"))
+        self.assertEqual([p for m, p, b in client.session.calls if m == "POST"],
+                         ["/sessions/s1/logs/batch", "/sessions/s1/logs", "/sessions/s1/logs"])
+
+
+class QueuedDeliveryTest(unittest.TestCase):
+    """日志和状态的后台队列上报"""
+
+    def setUp(self):
+        MCPClient._unsupported_endpoints.clear()
+        self.addCleanup(MCPClient._unsupported_endpoints.clear)
+        patcher = mock.patch.object(mcp_protocol, "SEND_RETRY_BACKOFF", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _ok(method, path, body):
+        return FakeResponse(200, {})
+
+    def test_order_is_preserved_and_logs_are_batched(self):
+        client = make_client(self._ok)
+        client.add_log("a")
+        client.add_log("b")
+        client.update_status("running", "状态")
+        client.add_log("c")
+        client.close()
+
+        sent = [(p, [e["message"] for e in b["logs"]] if "logs" in b else b["status"])
+                for m, p, b in client.session.calls]
+        self.assertEqual(sent, [("/sessions/s1/logs/batch", ["a", "b"]),
+                                ("/sessions/s1/status", "running"),
+                                ("/sessions/s1/logs/batch", ["c"])])
+
+    def test_close_flushes_queue_before_closing_session(self):
+        client = make_client(self._ok)
+        for i in range(5):
+            client.add_log(str(i))
+        client.close()
+
+        self.assertTrue(client.session.closed)
+        self.assertIsNone(client._worker)
+        logs = [e["message"] for m, p, b in client.session.calls for e in b["logs"]]
+        self.assertEqual(logs, ["0", "1", "2", "3", "4"])
+
+    def test_partial_failure_retries_only_failed_entries(self):
+        MCPClient._unsupported_endpoints["http://mcp.test"] = {"logs_batch"}
+        failures = {"b": 1}
+
+        def route(method, path, body):
+            if failures.get(body["message"]):
+                failures[body["message"]] -= 1
+                return FakeResponse(500)
+            return FakeResponse(200, {})
+
+        client = make_client(route)
+        for message in "abc":
+            client.add_log(message)
+        client.close()
+
+        self.assertEqual([b["message"] for m, p, b in client.session.calls],
+                         ["a", "b", "c", "b"])
+
+    def test_add_log_is_refused_after_close(self):
+        client = make_client(self._ok)
+        client.close()
+
+        self.assertFalse(client.add_log("late"))
+        self.assertFalse(client.update_status("running"))
+        self.assertIsNone(client._worker)
+        self.assertEqual(client.session.calls, [])
+
+
+class NotifyBuildStartTest(unittest.TestCase):
+    """构建开始通知的回退与资源释放"""
+
+    def setUp(self):
+        MCPClient._unsupported_endpoints.clear()
+        self.addCleanup(MCPClient._unsupported_endpoints.clear)
+
+    def _notify(self, route):
+        client = make_client(route)
+        client.session_id = None
+        with mock.patch.object(mcp_protocol, "MCPClient", return_value=client):
+            result = mcp_protocol.notify_build_start("demo", "7", {"k": "v"})
+        return result, client
+
+    def test_falls_back_to_single_calls_without_start_build(self):
+        def route(method, path, body):
+            if path == "/builds/start":
+                return FakeResponse(405)
+            return FakeResponse(200, {"session_id": "s9", "stage_id": "st1"})
+        result, client = self._notify(route)
+
+        self.assertTrue(result)
+        self.assertTrue(client.session.closed)
+        paths = [p for m, p, b in client.session.calls]
+        self.assertEqual(paths[:3], ["/builds/start", "/sessions", "/sessions/s9/stages"])
+        self.assertNotIn("/batch", paths)
+        self.assertIn("/sessions/s9/status", paths)
+
+    def test_failed_start_build_does_not_retry(self):
+        result, client = self._notify(lambda m, p, b: FakeResponse(500))
+        self.assertFalse(result)
+        self.assertTrue(client.session.closed)
+        self.assertEqual([p for m, p, b in client.session.calls], ["/builds/start"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+通知模块测试
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from modules import notification
+from modules.notification import NotificationManager
+
+
+class ChannelSelectionTest(unittest.TestCase):
+    """通知渠道的选择"""
+
+    def setUp(self):
+        self.manager = NotificationManager({"slack": {"webhook": "http://hook.test"}})
+        self.sent = []
+        self.manager._channel_funcs["slack"] = \
+            lambda config, data: self.sent.append(data) or True
+
+    def test_default_channels_when_unspecified(self):
+        self.assertEqual(self.manager.send_notification({"x": 1}), {"slack": True})
+        self.assertEqual(self.sent, [{"x": 1}])
+
+    def test_explicit_empty_list_sends_nothing(self):
+        self.assertEqual(self.manager.send_notification({"x": 1}, channels=[]), {})
+        self.assertEqual(self.sent, [])
+
+    def test_async_explicit_empty_list_sends_nothing(self):
+        # 安装与未安装httpx时分别走异步实现和线程池回退
+        for httpx in (notification.httpx, None):
+            with self.subTest(httpx=httpx), \
+                    mock.patch.object(notification, "httpx", httpx):
+                result = asyncio.run(
+                    self.manager.asend_notification({"x": 1}, channels=[]))
+                self.assertEqual(result, {})
+        self.assertEqual(self.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+SSE解析模块测试
+"""
+
+import unittest
+
+from modules._sse import iter_sse_data
+
+
+class FakeStream:
+    """按固定大小切块返回响应体的桩响应"""
+
+    def __init__(self, body, size):
+        self.body = body
+        self.size = size
+
+    def iter_content(self, chunk_size=None):
+        for i in range(0, len(self.body), self.size):
+            yield self.body[i:i + self.size]
+
+
+class IterSseDataTest(unittest.TestCase):
+    """SSE流的逐行解析"""
+
+    def _parse(self, body):
+        # 每种切块大小下结果都应相同，覆盖行和 \r\n 被切断的情况
+        results = {tuple(iter_sse_data(FakeStream(body, size)))
+                   for size in (1, 2, 3, 7, len(body))}
+        self.assertEqual(len(results), 1)
+        return list(results.pop())
+
+    def test_lf_framing(self):
+        body = b'data: {"a": 1}\n\ndata: {"b": 2}\n\n'
+        self.assertEqual(self._parse(body), [b'{"a": 1}', b'{"b": 2}'])
+
+    def test_crlf_framing(self):
+        body = b'event: message\r\ndata: {"a": 1}\r\n\r\ndata: [DONE]\r\n\r\n'
+        self.assertEqual(self._parse(body), [b'{"a": 1}', b"[DONE]"])
+
+    def test_data_without_space(self):
+        body = b'data:{"a": 1}\n\ndata:  two spaces\n\n'
+        self.assertEqual(self._parse(body), [b'{"a": 1}', b" two spaces"])
+
+    def test_last_line_without_newline(self):
+        self.assertEqual(self._parse(b"data: tail"), [b"tail"])
+
+    def test_non_data_lines_are_skipped(self):
+        body = b": keep-alive\nevent: ping\nid: 3\nretry: 10\n\n"
+        self.assertEqual(self._parse(body), [])
+
+
+if __name__ == "__main__":
+    unittest.main()